@@ -1,18 +1,11 @@
 import argparse
-from gitbugsim.bug_simulator.bug_cli import add_bug_cli, assign_bug_cli, list_bugs_cli
+from gitbugsim.bug_simulator.bug_cli import add_bug_cli, assign_bug_cli, list_bugs_cli, search_cli, dedupe_cli, migrate_cli
 from gitbugsim.git_simulation.git_simulator import simulate_git_for_bug
+from gitbugsim.scenarios.scenario_grader import grade_cli
+from gitbugsim.git_simulation.sandbox_pool import provision_cli
 from gitbugsim.utils.display import display
 import sys
 
-if not display.rich_available:
-    print("\n⚠️  Optional: For enhanced visuals, run:")
-    print("    pip install rich\n")
-    
-    choice = input("❓ Want to install and restart? (y/n): ").strip().lower()
-    if choice == 'y':
-        print("ℹ️  Please run:\n    pip install rich\nThen restart the tool.\n")
-        sys.exit(1)
-
 parser = argparse.ArgumentParser(description="Bug Tracker CLI")
 subparsers = parser.add_subparsers(dest="command")
 
@@ -22,20 +15,84 @@ add_parser.set_defaults(func=add_bug_cli)
 
 # List bug
 list_parser = subparsers.add_parser("list", help="List all reported bugs")
+list_parser.add_argument("--page-size", type=int, default=None, help="Bugs per page; prints the --after-id for the next page")
+list_parser.add_argument("--after-id", type=int, default=None, help="Start after this bug ID (cursor from the previous page)")
+list_parser.add_argument("--history", help="Show history under each bug: all or last:N")
+list_parser.add_argument("--where", help="Filter, eg: \"status in (open,reopened) and tag:payment and assignee:dev2 and created>2025-06-01\"")
+list_parser.add_argument("--sort", help="Sort keys, '-' for descending, eg: priority,-updated (priority sorts high first)")
 list_parser.set_defaults(func=list_bugs_cli)
 
+# Search bugs
+search_parser = subparsers.add_parser("search", help="Full-text search over bug titles, descriptions and history")
+search_parser.add_argument("text", help="Words to look for, eg: \"payment null checkout\"")
+search_parser.add_argument("--limit", type=int, default=10, help="Most relevant bugs to show")
+search_parser.add_argument("--rebuild", action="store_true", help="Rebuild the search index from the bug store first")
+search_parser.set_defaults(func=search_cli)
+
+# Find duplicate reports
+dedupe_parser = subparsers.add_parser("dedupe", help="Group bugs that look like duplicate reports")
+dedupe_parser.add_argument("--threshold", type=float, default=0.5, help="Minimum estimated title/description similarity (0-1)")
+dedupe_parser.add_argument("--rebuild", action="store_true", help="Rebuild the duplicate index from the bug store first")
+dedupe_parser.set_defaults(func=dedupe_cli)
+
 # Assign bug
 assign_parser = subparsers.add_parser("assign", help="Assign a bug")
 assign_parser.set_defaults(func=assign_bug_cli)
 
+# Move bugs.json into SQLite
+migrate_parser = subparsers.add_parser("migrate", help="Move bugs from bugs.json into an indexed SQLite store")
+migrate_parser.add_argument("--force", action="store_true", help="Rebuild the SQLite store if it already exists")
+migrate_parser.set_defaults(func=migrate_cli)
+
 #Git simulation 
 simulate_parser = subparsers.add_parser("simulate", help="Start Git simulation for a bug")
+simulate_parser.add_argument("--speed", type=float, default=1.0, help="Animation speed multiplier (eg: 2 = twice as fast)")
+simulate_parser.add_argument("--no-animation", action="store_true", help="Show transitions instantly")
+simulate_parser.add_argument("--bug", type=int, help="Bug ID to simulate (skips the prompt)")
+simulate_parser.add_argument("--script", help="Run commands and write/delete edit directives from a file ('-' for stdin) without prompts")
+simulate_parser.add_argument("--output", choices=["jsonl", "json"], default="jsonl", help="Result format for --script")
+simulate_parser.add_argument("--record", help="Append each command's result and working-tree edits to this transcript file")
 simulate_parser.set_defaults(func=simulate_git_for_bug)
 
-args = parser.parse_args()
+# Grade recorded sessions
+grade_parser = subparsers.add_parser("grade", help="Replay recorded transcripts and grade scenario progress")
+grade_parser.add_argument("transcripts", nargs="+", help="Transcript files (command lists or --record/--script output)")
+grade_parser.add_argument("--bug", type=int, required=True, help="Bug ID whose scenario the transcripts attempt")
+grade_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+grade_parser.add_argument("--output", help="Write JSONL results here instead of stdout")
+grade_parser.set_defaults(func=grade_cli)
+
+# Pre-build bug repos
+provision_parser = subparsers.add_parser("provision", help="Prepare bug repos ahead of time for instant simulate startup")
+provision_parser.add_argument("--bugs", required=True, help="Bug IDs to prepare (eg: 1-200 or 1,4,7-9)")
+provision_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+provision_parser.add_argument("--pool-size", type=int, default=2, help="Ready sandboxes to keep per bug")
+provision_parser.add_argument("--watch", type=float, default=None, help="Keep topping up the pool every N seconds")
+provision_parser.set_defaults(func=provision_cli)
+
+
+
+def main():
+    if not display.rich_available:
+        print("\n⚠️  Optional: For enhanced visuals, run:")
+        print("    pip install rich\n")
+
+        choice = input("❓ Want to install and restart? (y/n): ").strip().lower()
+        if choice == 'y':
+            print("ℹ️  Please run:\n    pip install rich\nThen restart the tool.\n")
+            sys.exit(1)
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+    else:
+        options = {k: v for k, v in vars(args).items() if k not in {"command", "func"}}
+        args.func(**options)
+
 
-if args.command is None:
-    parser.print_help()
-else:
-    args.func()
+# `grade` and `provision` start worker processes that import this module;
+# only the parent may run the command
+if __name__ == "__main__":
+    main()
 
@@ -1,7 +1,9 @@
-from gitbugsim.utils.file_ops import load_file
+from gitbugsim.utils.file_ops import load_file, bug_store, migrate_bugs
 from gitbugsim.utils.common import available_fields, prompt, scenario_id_validation_prompt
-from gitbugsim.bug_simulator.bug_ops import add_bug, assign_bug, available_tags_chck, print_bug, print_open_bugs, specific_bug
-from gitbugsim.utils.config import BUG_FILE, SCENARIO_FILE
+from gitbugsim.bug_simulator.bug_ops import add_bug, assign_bug, available_tags_chck, print_open_bugs, specific_bug, list_bug_page, print_bug_line
+from gitbugsim.utils.bug_search import search_index, SearchUnavailable
+from gitbugsim.utils.bug_dedupe import dedupe_index, THRESHOLD
+from gitbugsim.utils.config import BUG_FILE, BUG_DB, SCENARIO_FILE
 from gitbugsim.utils.auth import is_valid_user_for_role
 
 def add_bug_cli():
@@ -13,6 +15,9 @@ def add_bug_cli():
 
     title = prompt("📝", "Title") 
     description = prompt("🧾", "Description", 2, 0) 
+    if not confirm_not_duplicate(title, description):
+        print("🎯 Report cancelled.")
+        return
     scenario_id = scenario_id_validation_prompt(scenario_map)
     reported_by = is_valid_user_for_role("Reported by", "reporter", "report", "✍️", 4) 
     tags = available_tags_chck()
@@ -20,16 +25,28 @@ def add_bug_cli():
     add_bug(title, description, scenario_id, reported_by, tags)
 
 
+def confirm_not_duplicate(title, description, limit=3):
+    store = bug_store()
+    hits = [(store.get(bug_id), score) for bug_id, score in dedupe_index().similar(title, description, limit)]
+    hits = [(bug, score) for bug, score in hits if bug]
+    if not hits:
+        return True
+
+    print("\n⚠️  This looks like an existing report:")
+    for bug, score in hits:
+        print(f"   #{bug['id']:<6} {int(score * 100):>3}% similar | {bug['status']:<11} | {bug['title'][:50]}")
+    return input("\nReport it anyway? (y/n): ").lower() == "y"
+
+
 def assign_bug_cli():
-    bugs = load_file(BUG_FILE)
+    store = bug_store()
     
-    if not bugs:
+    if not store.count():
        print("\nNo 🐞 bugs reported. Run python cli.py add\n")
        return
     
     available_fields()
     print("\n🐞 Assign a Bug!\n" + "-"*32)
-    bug_map = {bug["id"]: bug for bug in bugs}
     bug_id = prompt("🐞", "Bug ID")
 
     while True:
@@ -44,25 +61,29 @@ def assign_bug_cli():
             bug_id = prompt("🐞", "Bug ID (or 'q' to quit)")
             continue
 
-        bug_to_update = bug_map.get(bug_id_int)
+        bug_to_update = store.get(bug_id_int)
 
         if not bug_to_update:
             print(f"❌ Bug #{bug_id} not found.")
             bug_id = prompt("🐞", "Bug ID (or 'q' to quit)")
         else:
-            assign_bug(bugs, bug_id_int, bug_to_update)
+            assign_bug(bug_id_int, bug_to_update)
             return
 
 
-def list_bugs_cli():
-    bugs = load_file(BUG_FILE)
-    scenarios = load_file(SCENARIO_FILE)
-    scenario_map = {scenario['id'] : scenario for scenario in scenarios} if scenarios else None
-
-    if not bugs:
+def list_bugs_cli(page_size=None, after_id=None, history=None, where=None, sort=None):
+    store = bug_store()
+    if not store.count():
        print("No 🐞 bugs reported. Run python cli.py add")
        return
 
+    if page_size or after_id is not None or history or where or sort:
+        list_bug_page(page_size, after_id, history, where, sort)
+        return
+
+    scenarios = load_file(SCENARIO_FILE)
+    scenario_map = {scenario['id'] : scenario for scenario in scenarios} if scenarios else None
+
     print("""What do you want to list?
     1. 🐞 All bugs
     2. 🛠️  Open and Reopened bugs
@@ -72,12 +93,71 @@ def list_bugs_cli():
     choice = prompt("🔢","Enter choice (1, 2 or 3)").strip()
 
     if choice == "1":
-        print("📃 Listing all bugs:\n")
-        for bug in bugs:
-          print_bug(bug,scenario_map)
+        print("📃 Listing all bugs (python cli.py list --history last:5 to include history):\n")
+        list_bug_page()
     elif choice == "2":
-        print_open_bugs(bugs)
+        print_open_bugs()
     elif choice == "3":
-        specific_bug(bugs,scenario_map)
+        specific_bug(scenario_map)
     else:
         print("❌ Invalid option. Please choose 1, 2 or 3.")
+
+
+def search_cli(text, limit=10, rebuild=False):
+    store = bug_store()
+    if not store.count():
+       print("No 🐞 bugs reported. Run python cli.py add")
+       return
+
+    try:
+        index = search_index()
+        if rebuild:
+            index.rebuild()
+    except SearchUnavailable as e:
+        print(f"❌ Search needs SQLite with FTS5: {e}")
+        exit(1)
+
+    hits = [(store.get(bug_id), score) for bug_id, score in index.search(text, limit)]
+    hits = [(bug, score) for bug, score in hits if bug]
+    if not hits:
+        print(f"❌ No bugs match '{text}'.")
+        return
+
+    print(f"{'Score':<7} | {'id':<6} | {'Status':<11} | {'Prio':<6} | {'Assignee':<10} | {'Title':<40} | Tags")
+    print("-" * 110)
+    for bug, score in hits:
+        print(f"{score:<7} | ", end="")
+        print_bug_line(bug)
+
+
+def dedupe_cli(threshold=THRESHOLD, rebuild=False):
+    store = bug_store()
+    if not store.count():
+       print("No 🐞 bugs reported. Run python cli.py add")
+       return
+
+    index = dedupe_index()
+    if rebuild:
+        index.rebuild()
+
+    clusters = index.clusters(threshold)
+    if not clusters:
+        print("✅ No likely duplicates found.")
+        return
+
+    for group in clusters:
+        print(f"\n🔁 {len(group)} likely duplicates:")
+        for bug_id in group:
+            bug = store.get(bug_id)
+            if bug:
+                print_bug_line(bug)
+    print(f"\n{len(clusters)} clusters, {sum(map(len, clusters))} bugs.")
+
+
+def migrate_cli(force=False):
+    if BUG_DB.exists() and not force:
+        print(f"❌ {BUG_DB} already exists. Use --force to rebuild it from {BUG_FILE.name}.")
+        return
+
+    count = migrate_bugs()
+    print(f"✅ Migrated {count} bugs to {BUG_DB}. Commands now use the SQLite store.")
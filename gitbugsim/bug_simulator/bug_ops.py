@@ -1,8 +1,8 @@
 import json
-from gitbugsim.utils.file_ops import load_file, save_bugs
+from gitbugsim.utils.file_ops import bug_store
+from gitbugsim.utils.bug_query import BugQuery, QueryError
 from gitbugsim.utils.common import currtime, prompt, bug_id_validation_prompt
 from gitbugsim.utils.auth import invalid_msg, is_valid_user_for_role
-from gitbugsim.utils.config import BUG_FILE
 
 
 ################################################## ADD bug ################################################
@@ -22,8 +22,8 @@ def available_tags_chck():
 
 
 def add_bug(title, description, scenario_id, reported_by, tags):
-    bugs = load_file(BUG_FILE)
-    bug_id = (bugs[-1]["id"] + 1) if bugs else 1
+    store = bug_store()
+    bug_id = store.allocate_id()
     now = currtime()
 
     history_entry = {
@@ -55,14 +55,13 @@ def add_bug(title, description, scenario_id, reported_by, tags):
            "last_attempt": None
         }
 
-    bugs.append(new_bug)
-    save_bugs(bugs)
+    store.add(new_bug)
     print(f"✅ Bug #{bug_id} reported. You can check list now (python cli.py list)")
     
 
 ################################################## ASSIGN bug ################################################
 
-def assign_bug(bugs, bug_id, bug_to_update):
+def assign_bug(bug_id, bug_to_update):
 
     bug_assigned_already = bug_to_update["assigned_to"]
     old_status = bug_to_update["status"]
@@ -92,7 +91,7 @@ def assign_bug(bugs, bug_id, bug_to_update):
             })
             bug_to_update["status"] = "reopened"
             bug_to_update["updated_at"] = now
-            save_bugs(bugs)
+            bug_store().update(bug_to_update)
             print(f"✅ Bug #{bug_id} status changed to reopened.")
 
         if input("\nDo you want to reassign? (y/n): ").lower() != "y":
@@ -117,7 +116,7 @@ def assign_bug(bugs, bug_id, bug_to_update):
     bug_to_update["updated_at"] = now
     bug_to_update["history"].append(history_entry)
 
-    save_bugs(bugs)
+    bug_store().update(bug_to_update)
     print(f"✅ Bug {bug_id} assigned to {assignee} by {assigned_by}. You can check list now (python cli.py list)")
 
 
@@ -143,8 +142,71 @@ def print_bug(bug,scenario_map):
 """ + "-"*150)
 
 
-def print_open_bugs(bugs):
-    open_bugs = [b for b in bugs if b["status"] in {"open", "reopened"}]
+def parse_history_spec(spec):
+    """`--history` value to the number of entries to show: "all" -> None,
+    "last:5" -> 5. Raises ValueError for anything else."""
+    if spec == "all":
+        return None
+    kind, _, count = spec.partition(":")
+    if kind != "last" or not count.isdigit():
+        raise ValueError(spec)
+    return int(count)
+
+
+def print_bug_line(bug, history=False, last=None):
+    assignee = bug['assigned_to'] or '-'
+    print(f"{bug['id']:<6} | {bug['status']:<11} | {bug['priority'] or '-':<6} | {assignee:<10} | "
+          f"{bug['title'][:40]:<40} | {','.join(bug['tags'] or [])}")
+
+    if history:
+        entries = bug.get('history', [])
+        for entry in entries[-last:] if last else entries:
+            moved = f" {entry['from']} → {entry['to']}" if 'from' in entry else (f" → {entry['to']}" if 'to' in entry else "")
+            print(f"{'':<6}   🕒 {entry.get('timestamp')}  {entry.get('action')}{moved}  by {entry.get('by')}")
+
+
+def list_bug_page(page_size=None, after_id=None, history=None, where=None, sort=None):
+    """Stream bugs matching `where` after `after_id` one line each; with
+    `page_size`, stop after one page and print the cursor for the next."""
+    last = None
+    if history:
+        try:
+            last = parse_history_spec(history)
+        except ValueError:
+            print(f"❌ Invalid --history value '{history}' (eg: all or last:5)")
+            exit(1)
+
+    try:
+        query = BugQuery(where, sort)
+    except QueryError as e:
+        print(f"❌ Invalid query: {e}")
+        exit(1)
+
+    # pages are cut by id, which only works while bugs come out in id order
+    if query.sort and (page_size or after_id is not None):
+        print("❌ --page-size/--after-id page by bug id and can't be combined with --sort; narrow the list with --where instead.")
+        exit(1)
+
+    print(f"{'id':<6} | {'Status':<11} | {'Prio':<6} | {'Assignee':<10} | {'Title':<40} | Tags")
+    print("-" * 100)
+
+    shown = last_id = 0
+    for bug in bug_store().query(query, after_id, page_size, history=bool(history)):
+        print_bug_line(bug, bool(history), last)
+        shown += 1
+        last_id = bug['id']
+
+    if not shown:
+        print("❌ No bugs found.")
+    elif page_size and shown == page_size:
+        print(f"\n➡️  Next page: python cli.py list --page-size {page_size} --after-id {last_id}")
+
+
+def print_open_bugs(bugs=None):
+    if bugs is None:
+        open_bugs = list(bug_store().query(BugQuery("status in (open,reopened)"), history=False))
+    else:
+        open_bugs = [b for b in bugs if b["status"] in {"open", "reopened"}]
 
     if not open_bugs:
         print("❌ No open or reopened bugs found.")
@@ -160,8 +222,8 @@ def print_open_bugs(bugs):
     print('\n')
 
 
-def specific_bug(bugs,scenario_map):
-    bug = bug_id_validation_prompt(bugs)    
+def specific_bug(scenario_map):
+    bug = bug_id_validation_prompt()    
     print_bug(bug,scenario_map)
 
 
@@ -0,0 +1,130 @@
+import atexit, os, subprocess
+from collections import OrderedDict
+from pathlib import Path
+from .git_refs import find_git_dir
+
+
+class CatFileWorker:
+    """Long-lived `git cat-file --batch` / `--batch-check` pair for one repo.
+
+    Object contents are kept in an LRU keyed by object id, so re-reading the
+    same blob is a single `--batch-check` round-trip (or free for a full oid).
+    """
+
+    def __init__(self, repo_path, cache_size=256):
+        self.repo_path = repo_path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._batch = None
+        self._check = None
+        self._index_stat = None
+
+    def _spawn(self, mode):
+        return subprocess.Popen(
+            ["git", "cat-file", mode],
+            cwd=self.repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def _index_signature(self):
+        try:
+            st = os.stat((find_git_dir(self.repo_path) or Path(self.repo_path) / ".git") / "index")
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _ensure_started(self, rev):
+        # cat-file loads the index once, so `:path` lookups need a fresh process after `git add`
+        if rev.startswith(":") and self._check is not None and self._index_stat != self._index_signature():
+            self.close()
+
+        if self._check is None or self._check.poll() is not None:
+            self._check = self._spawn("--batch-check")
+            self._index_stat = self._index_signature()
+        if self._batch is None or self._batch.poll() is not None:
+            self._batch = self._spawn("--batch")
+
+    @staticmethod
+    def _request(proc, rev):
+        proc.stdin.write(rev.encode("utf-8") + b"\n")
+        proc.stdin.flush()
+        header = proc.stdout.readline().decode("utf-8").split()
+        if len(header) != 3:
+            return None
+        oid, obj_type, size = header
+        return oid, obj_type, int(size)
+
+    def info(self, rev):
+        if not rev or "\n" in rev:
+            return None
+        try:
+            self._ensure_started(rev)
+            return self._request(self._check, rev)
+        except (OSError, ValueError):
+            self.close()
+            return None
+
+    def read(self, rev):
+        info = self.info(rev)
+        if info is None:
+            return None
+
+        oid, obj_type, size = info
+        if oid in self._cache:
+            self._cache.move_to_end(oid)
+            return oid, obj_type, self._cache[oid]
+
+        try:
+            if self._request(self._batch, oid) is None:
+                return None
+            data = self._batch.stdout.read(size)
+            self._batch.stdout.read(1)  # trailing newline
+        except (OSError, ValueError):
+            self.close()
+            return None
+
+        self._cache[oid] = data
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return oid, obj_type, data
+
+    def close(self):
+        for proc in (self._check, self._batch):
+            if proc is None:
+                continue
+            try:
+                proc.stdin.close()
+                proc.wait(timeout=1)
+            except Exception:
+                proc.kill()
+        self._check = None
+        self._batch = None
+
+
+_workers = {}
+
+
+def get_cat_file(repo_path):
+    key = str(Path(repo_path).resolve())
+    worker = _workers.get(key)
+    if worker is None:
+        worker = CatFileWorker(key)
+        _workers[key] = worker
+    return worker
+
+
+def close_cat_files(repo_path=None):
+    if repo_path is None:
+        keys = list(_workers)
+    else:
+        keys = [str(Path(repo_path).resolve())]
+
+    for key in keys:
+        worker = _workers.pop(key, None)
+        if worker:
+            worker.close()
+
+
+atexit.register(close_cat_files)
@@ -0,0 +1,69 @@
+COMMON_CMDS = {
+    "add", "branch", "checkout", "commit", "diff", "fetch", "init", "log", "merge",
+    "pull", "push", "rebase", "remote", "reset", "restore", "revert", "show", "stash",
+    "status", "switch"
+}
+
+
+def edit_distance(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """Burkhard-Keller tree over command names for typo lookups."""
+
+    def __init__(self, words=()):
+        self.root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            return
+
+        node = self.root
+        while True:
+            dist = edit_distance(word, node[0])
+            if dist == 0:
+                return
+            child = node[1].get(dist)
+            if child is None:
+                node[1][dist] = (word, {})
+                return
+            node = child
+
+    def search(self, word, max_dist):
+        matches = []
+        stack = [self.root] if self.root else []
+
+        while stack:
+            candidate, children = stack.pop()
+            dist = edit_distance(word, candidate)
+            if dist <= max_dist:
+                matches.append((dist, candidate))
+            for child_dist, child in children.items():
+                if dist - max_dist <= child_dist <= dist + max_dist:
+                    stack.append(child)
+
+        return matches
+
+
+def suggest(tree, word, limit=3):
+    max_dist = 1 if len(word) <= 3 else 2
+    matches = tree.search(word, max_dist)
+    matches.sort(key=lambda m: (m[0], m[1] not in COMMON_CMDS, m[1]))
+    return [candidate for _, candidate in matches[:limit]]
@@ -0,0 +1,182 @@
+import heapq
+from collections import namedtuple
+from .git_refs import list_refs, read_head, resolve_ref
+from .object_store import get_object_store, commit_subject, ObjectNotFound
+
+DagNode = namedtuple("DagNode", "oid parents generation commit_time subject")
+DagVersion = namedtuple("DagVersion", "number refs head head_ref size")
+DagDiff = namedtuple("DagDiff", "added moved_refs unreachable head_moved")
+
+MAX_VERSIONS = 16
+
+
+class DagUnavailable(Exception):
+    """The repo's refs or objects can't be read in-process."""
+
+
+class CommitDAG:
+    """In-memory commit graph of one repo, kept up to date incrementally.
+
+    `refresh()` only loads commits reachable from ref tips that changed since
+    the last refresh, stopping at commits already in the graph. Nodes are
+    never dropped, so a DagVersion is just the ref tips plus the node count
+    at that moment, and two versions can be diffed cheaply.
+    """
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.nodes = {}
+        self.order = []
+        self.version = None
+        self._versions = {}
+
+    def _store(self):
+        store = get_object_store(self.repo_path)
+        if store is None or store.rewritten_history:
+            raise DagUnavailable("object store not readable")
+        return store
+
+    def _peel(self, store, oid):
+        # annotated tags point at another object; follow them down to a commit
+        for _ in range(8):
+            try:
+                obj_type, data = store.read(oid)
+            except ObjectNotFound:
+                return None
+            if obj_type == "commit":
+                return oid
+            if obj_type != "tag":
+                return None
+            oid = data.split(b"\n", 1)[0].split(b" ", 1)[1].decode()
+        return None
+
+    def _load(self, store, tip):
+        if tip in self.nodes:
+            return
+
+        # collect unknown commits, then assign generations parents-first
+        pending, stack, commits = [], [tip], {}
+        while stack:
+            oid = stack.pop()
+            if oid in self.nodes or oid in commits:
+                continue
+            try:
+                commit = store.read_commit(oid)
+            except ObjectNotFound:
+                continue  # shallow boundary
+            commits[oid] = commit
+            pending.append(oid)
+            stack.extend(p for p in commit.parents if p not in self.nodes)
+
+        visit = [(oid, False) for oid in reversed(pending)]
+        while visit:
+            oid, parents_done = visit.pop()
+            if oid in self.nodes or oid not in commits:
+                continue
+            commit = commits[oid]
+            if not parents_done:
+                visit.append((oid, True))
+                visit.extend((p, False) for p in commit.parents if p in commits and p not in self.nodes)
+                continue
+
+            generation = 1 + max((self.nodes[p].generation for p in commit.parents if p in self.nodes), default=0)
+            self.nodes[oid] = DagNode(oid, commit.parents, generation, commit.commit_time, commit_subject(commit))
+            self.order.append(oid)
+
+    def refresh(self):
+        store = self._store()
+        refs = list_refs(self.repo_path)
+        head = read_head(self.repo_path)
+        if refs is None or head is None:
+            raise DagUnavailable("refs not readable")
+
+        head_ref = head[1] if head[0] == "ref" else None
+        head_oid = resolve_ref(self.repo_path, "HEAD")
+        previous = self.version.refs if self.version else {}
+
+        tips = {}
+        for name, oid in refs.items():
+            if previous.get(name) == oid and oid in self.nodes:
+                tips[name] = oid
+                continue
+            commit_oid = self._peel(store, oid)
+            if commit_oid:
+                self._load(store, commit_oid)
+                tips[name] = commit_oid
+        if head_oid and head_oid not in self.nodes:
+            self._load(store, head_oid)
+
+        if (self.version is None or tips != self.version.refs or head_oid != self.version.head
+                or head_ref != self.version.head_ref):
+            number = self.version.number + 1 if self.version else 1
+            self.version = DagVersion(number, tips, head_oid, head_ref, len(self.order))
+            self._versions[number] = self.version
+            if len(self._versions) > MAX_VERSIONS:
+                self._versions.pop(min(self._versions))
+        return self.version
+
+    def tips(self, version):
+        tips = set(version.refs.values())
+        if version.head:
+            tips.add(version.head)
+        return tips
+
+    def diff(self, before, after):
+        moved = {}
+        for name in set(before.refs) | set(after.refs):
+            old, new = before.refs.get(name), after.refs.get(name)
+            if old != new:
+                moved[name] = (old, new)
+
+        added = self.order[before.size:after.size]
+        unreachable = self.unreachable(self.tips(before), self.tips(after))
+        return DagDiff(added, moved, unreachable, before.head != after.head)
+
+    def unreachable(self, old_tips, new_tips):
+        """Commits reachable from `old_tips` but from none of `new_tips`.
+
+        Both sides are painted down in generation order; the walk stops as
+        soon as every queued commit is reachable from the new tips, so the
+        cost is bounded by the part of history that actually changed.
+        """
+        OLD, NEW = 1, 2
+        flags, heap = {}, []
+
+        def push(oid, flag):
+            node = self.nodes.get(oid)
+            old_flag = flags.get(oid, 0)
+            if node is None or old_flag | flag == old_flag:
+                return
+            flags[oid] = old_flag | flag
+            heapq.heappush(heap, (-node.generation, oid))
+
+        for oid in old_tips - new_tips:
+            push(oid, OLD)
+        if not flags:
+            return []
+        for oid in new_tips:
+            push(oid, NEW)
+
+        while heap and any(flags[oid] & OLD and not flags[oid] & NEW for _, oid in heap):
+            _, oid = heapq.heappop(heap)
+            for parent in self.nodes[oid].parents:
+                push(parent, flags[oid])
+
+        lost = [oid for oid, flag in flags.items() if flag == OLD]
+        lost.sort(key=lambda oid: -self.nodes[oid].generation)
+        return lost
+
+    def get_version(self, number):
+        return self._versions.get(number)
+
+
+_dags = {}
+
+
+def get_commit_dag(repo_path):
+    key = str(repo_path)
+    dag = _dags.get(key)
+    if dag is None:
+        dag = CommitDAG(repo_path)
+        _dags[key] = dag
+    return dag
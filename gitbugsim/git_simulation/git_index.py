@@ -0,0 +1,134 @@
+import mmap, os, struct
+from collections import namedtuple
+from .git_refs import find_git_dir
+
+IndexEntry = namedtuple("IndexEntry", "path mode oid stage flags ctime mtime dev ino uid gid size")
+
+ENTRY_HEADER = struct.Struct(">10I20sH")
+EXTENDED_FLAG = 0x4000
+# extended flags are stored shifted above the 16 base flag bits
+INTENT_TO_ADD = 0x2000 << 16
+SKIP_WORKTREE = 0x4000 << 16
+OID_LEN = 20
+
+
+class UnsupportedIndexError(Exception):
+    """Raised when the index uses a feature we can't read; callers fall back to the git CLI."""
+
+
+def _read_varint(buf, pos):
+    # git's offset varint, used for the v4 path prefix length
+    byte = buf[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = buf[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+class GitIndex:
+    """Memory-mapped reader for `.git/index` versions 2, 3 and 4.
+
+    Entries are decoded lazily from the mapping. Extensions whose signature
+    starts with an uppercase letter are optional and skipped; any other
+    extension (split index, sparse index, ...) raises UnsupportedIndexError
+    once iteration reaches it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            if self.stat.st_size < 12 + OID_LEN:
+                raise UnsupportedIndexError("index file is truncated")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._buf = memoryview(self._map)
+        signature, self.version, self.count = struct.unpack_from(">4sII", self._buf, 0)
+        if signature != b"DIRC":
+            self.close()
+            raise UnsupportedIndexError("not an index file")
+        if self.version not in (2, 3, 4):
+            self.close()
+            raise UnsupportedIndexError(f"index version {self.version}")
+
+    def __iter__(self):
+        return self.entries()
+
+    def entries(self):
+        buf, pos, prev_path = self._buf, 12, b""
+        end = len(buf) - OID_LEN
+
+        for _ in range(self.count):
+            start = pos
+            (ctime_s, ctime_ns, mtime_s, mtime_ns, dev, ino, mode, uid, gid, size,
+             oid, flags) = ENTRY_HEADER.unpack_from(buf, pos)
+            pos += ENTRY_HEADER.size
+
+            if flags & EXTENDED_FLAG:
+                if self.version < 3:
+                    raise UnsupportedIndexError("extended flags in a v2 index")
+                flags |= struct.unpack_from(">H", buf, pos)[0] << 16
+                pos += 2
+
+            if self.version == 4:
+                strip, pos = _read_varint(buf, pos)
+                nul = self._map.find(b"\0", pos)
+                path = prev_path[:len(prev_path) - strip] + bytes(buf[pos:nul])
+                pos = nul + 1
+            else:
+                nul = self._map.find(b"\0", pos)
+                path = bytes(buf[pos:nul])
+                # entries are NUL-padded to a multiple of eight bytes
+                pos = start + ((nul - start + 8) & ~7)
+
+            prev_path = path
+            yield IndexEntry(
+                path.decode("utf-8", errors="surrogateescape"), mode, oid.hex(), (flags >> 12) & 0x3,
+                flags, (ctime_s, ctime_ns), (mtime_s, mtime_ns), dev, ino, uid, gid, size
+            )
+
+        while pos + 8 <= end:
+            ext_sig = bytes(buf[pos:pos + 4])
+            ext_size = struct.unpack_from(">I", buf, pos + 4)[0]
+            if not (65 <= ext_sig[0] <= 90):
+                raise UnsupportedIndexError(f"index extension {ext_sig!r}")
+            pos += 8 + ext_size
+
+    def close(self):
+        self._buf.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_index(repo_path):
+    git_dir = find_git_dir(repo_path)
+    if git_dir is None:
+        raise UnsupportedIndexError("not a git repository")
+
+    config = git_dir / "config"
+    try:
+        if "objectformat" in config.read_text(encoding="utf-8").lower():
+            raise UnsupportedIndexError("non-sha1 object format")
+    except OSError:
+        pass
+
+    index_path = git_dir / "index"
+    if not index_path.exists():
+        return None
+    return GitIndex(index_path)
+
+
+def read_index_entries(repo_path):
+    index = open_index(repo_path)
+    if index is None:
+        return []
+    with index:
+        return list(index.entries())
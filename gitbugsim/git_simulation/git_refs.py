@@ -0,0 +1,147 @@
+import os
+from pathlib import Path
+
+# Refs that live in each worktree's own git dir rather than the shared common dir
+PER_WORKTREE_PREFIXES = ("refs/bisect/", "refs/worktree/", "refs/rewritten/")
+
+_packed_cache = {}
+
+
+def find_git_dir(repo_path):
+    dot_git = Path(repo_path) / ".git"
+    if dot_git.is_dir():
+        return dot_git
+    if (Path(repo_path) / "HEAD").is_file() and (Path(repo_path) / "objects").is_dir():
+        return Path(repo_path)  # bare repository
+
+    # linked worktrees and submodules have a `.git` file: "gitdir: <path>"
+    try:
+        content = dot_git.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    if not content.startswith("gitdir:"):
+        return None
+
+    git_dir = Path(content[len("gitdir:"):].strip())
+    if not git_dir.is_absolute():
+        git_dir = Path(repo_path) / git_dir
+    return git_dir
+
+
+def find_common_dir(git_dir):
+    try:
+        common = Path((git_dir / "commondir").read_text(encoding="utf-8").strip())
+    except OSError:
+        return git_dir
+    return common if common.is_absolute() else (git_dir / common)
+
+
+def is_native_readable(git_dir):
+    # reftable repos keep refs in a binary format we don't parse
+    return git_dir is not None and not (find_common_dir(git_dir) / "reftable").exists()
+
+
+def read_packed_refs(common_dir):
+    path = common_dir / "packed-refs"
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}
+
+    key = str(path)
+    signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached = _packed_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    refs = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line or line[0] in "#^":
+                continue
+            oid, _, name = line.partition(" ")
+            refs[name] = oid
+
+    _packed_cache[key] = (signature, refs)
+    return refs
+
+
+def _ref_dir(git_dir, refname):
+    if refname == "HEAD" or "/" not in refname or refname.startswith(PER_WORKTREE_PREFIXES):
+        return git_dir
+    return find_common_dir(git_dir)
+
+
+def read_raw_ref(git_dir, refname):
+    try:
+        content = (_ref_dir(git_dir, refname) / refname).read_text(encoding="utf-8").strip()
+    except (OSError, UnicodeDecodeError):
+        oid = read_packed_refs(find_common_dir(git_dir)).get(refname)
+        return ("oid", oid) if oid else None
+
+    if content.startswith("ref:"):
+        return ("ref", content[len("ref:"):].strip())
+    return ("oid", content)
+
+
+def read_head(repo_path):
+    git_dir = find_git_dir(repo_path)
+    if not is_native_readable(git_dir):
+        return None
+    return read_raw_ref(git_dir, "HEAD")
+
+
+def resolve_ref(repo_path, refname, max_depth=5):
+    git_dir = find_git_dir(repo_path)
+    if not is_native_readable(git_dir):
+        return None
+
+    for _ in range(max_depth):
+        raw = read_raw_ref(git_dir, refname)
+        if raw is None:
+            return None
+        kind, value = raw
+        if kind == "oid":
+            return value
+        refname = value
+    return None
+
+
+def list_refs(repo_path, prefix="refs/"):
+    git_dir = find_git_dir(repo_path)
+    if not is_native_readable(git_dir):
+        return None
+
+    common_dir = find_common_dir(git_dir)
+    refs = {name: oid for name, oid in read_packed_refs(common_dir).items() if name.startswith(prefix)}
+
+    # loose refs override packed ones
+    for base in {git_dir, common_dir}:
+        refs_root = base / "refs"
+        for dirpath, _, filenames in os.walk(refs_root):
+            for filename in filenames:
+                if filename.endswith(".lock"):
+                    continue
+                full = Path(dirpath) / filename
+                name = full.relative_to(base).as_posix()
+                if not name.startswith(prefix):
+                    continue
+                try:
+                    content = full.read_text(encoding="utf-8").strip()
+                except (OSError, UnicodeDecodeError):
+                    continue
+                if content.startswith("ref:"):
+                    target = resolve_ref(repo_path, content[len("ref:"):].strip())
+                    if target:
+                        refs[name] = target
+                else:
+                    refs[name] = content
+    return refs
+
+
+def short_ref_name(refname):
+    for prefix in ("refs/heads/", "refs/tags/", "refs/remotes/", "refs/"):
+        if refname.startswith(prefix):
+            return refname[len(prefix):]
+    return refname
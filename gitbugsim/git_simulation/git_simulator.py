@@ -1,25 +1,255 @@
-import shlex
-from gitbugsim.utils.file_ops import load_file
-from gitbugsim.utils.config import BUG_FILE, SCENARIO_FILE
+import copy, json, shlex, shutil, sys, tempfile, time
+from contextlib import contextmanager
+from gitbugsim.utils.file_ops import load_file, bug_store
+from gitbugsim.utils.config import (
+    SCENARIO_FILE, simulation_root, set_simulation_root,
+    template_cache_dir, set_template_cache_dir
+)
 from gitbugsim.utils.common import bug_id_validation_prompt
 from .git_utils import (
     setup_git_repo_for_bug, run_git_command, git_valid_cmds, 
     check_output, clear_screen, explain_cmd, 
     check_supported_cmds, display_branch_prompt,
-    get_modified_files, check_cmd_syntax
+    get_modified_files, check_cmd_syntax,
+    suggest_git_cmds, forget_valid_cmds
+)
+from .visualizer import (
+    list_git_dir, show_git_state, animate_git_transition, 
+    show_graph_comparision, configure_animation
 )
-from .visualizer import list_git_dir, show_git_state, animate_git_transition, show_graph_comparision
 from .git_command_hooks import command_hooks 
 from gitbugsim.scenarios.scenario_simulator import (
     check_scenario_mode, check_scenario_progress,
     handle_keyboard_interrupt, handle_exit
 )
+from gitbugsim.scenarios.remote_engine import RemoteManager
 from gitbugsim.utils.display import display
 from .graph_manager import graph_tracker
+from .cat_file import close_cat_files
+from .object_store import close_object_stores
+from .transcript import parse_steps, apply_edits, WorktreeRecorder
     
 
-def simulate_git_for_bug():
-    bugs = load_file(BUG_FILE)
+def new_record(cmd):
+    return {
+        "cmd": cmd,
+        "ts": round(time.time(), 3),
+        "status": None,
+        "returncode": None,
+        "stdout": "",
+        "stderr": "",
+        "error_hook": None,
+        "suggestions": [],
+        "scenario": None
+    }
+
+
+def scenario_record(scenario_engine, was_active):
+    if scenario_engine:
+        return {"step": scenario_engine.current_step, "progress": scenario_engine.get_progress(), "completed": False}
+    if was_active:
+        return {"step": None, "progress": 100, "completed": True}
+    return None
+
+
+def run_sim_command(cmd, repo, scenario_engine, interactive=True):
+    """Run one line typed at the simulator prompt through the command pipeline.
+
+    Returns (record, scenario_engine). Transitions, graphs, the state table and
+    the "see Git Output" prompt are only shown when `interactive` is set.
+    """
+    record = new_record(cmd)
+    record["scenario"] = scenario_record(scenario_engine, False)
+
+    if not cmd:
+        record["status"] = "empty"
+        return record, scenario_engine
+    if cmd.lower() == "exit":
+        record["status"] = "exit"
+        return record, scenario_engine
+    if cmd.lower() == "clear":
+        record["status"] = "clear"
+        if interactive:
+            clear_screen()
+        return record, scenario_engine
+    if cmd.lower() == 'hint' and scenario_engine:
+        record["status"] = "hint"
+        scenario_engine.show_hint()
+        return record, scenario_engine
+
+    try:
+        parts = shlex.split(cmd)
+    except ValueError as e:
+        display.print(f"Skipping invalid command: {cmd}\nReason: {e}",style='red')
+        record["status"] = "parse_error"
+        record["stderr"] = str(e)
+        return record, scenario_engine
+
+    if cmd.startswith('explain'):
+        record["status"] = "explain"
+        if interactive:
+            explain_cmd(parts,command_hooks) 
+        return record, scenario_engine
+
+    git_cmd = parts[0].lower()
+    if git_cmd == "git":
+        display.print("🏁 **git** prefix already handled automatically just run cmds (status, add, commit etc..)\n",style='green')
+        record["status"] = "git_prefix"
+        return record, scenario_engine
+                     
+    if git_cmd not in git_valid_cmds(repo):
+        display.print(f"❌ `{git_cmd}` is not a valid Git command.", style="red")
+        suggestions = suggest_git_cmds(repo, git_cmd)
+        if suggestions:
+            display.print(f"💡 Did you mean: [yellow]{', '.join(suggestions)}[/]?")
+        if interactive:
+            print()
+        record["status"] = "invalid_command"
+        record["suggestions"] = suggestions
+        return record, scenario_engine
+    
+    is_cmd_supported = check_supported_cmds(parts)
+    if not is_cmd_supported:
+        record["status"] = "unsupported"
+        return record, scenario_engine
+    
+    pre_state = None
+    if interactive and git_cmd in {'add'}:
+        pre_state = get_modified_files(repo)
+     
+    is_syntax_correct = check_cmd_syntax(git_cmd,parts)
+    if not is_syntax_correct:
+        record["status"] = "syntax_error"
+        return record, scenario_engine
+    
+    if interactive:
+        graph_tracker.capture_if_needed(git_cmd, repo)
+    returncode, stdout, stderr = run_git_command(repo, parts)
+    not_error, feedback, error_hook = check_output(returncode, stdout, stderr, git_cmd)
+    record.update(
+        status="ok" if not_error else ("git_error" if returncode else "warning"),
+        returncode=returncode, stdout=stdout, stderr=stderr, error_hook=error_hook
+    )
+
+    if git_cmd == 'config' and any('alias' in p.lower() for p in parts[1:]):
+        forget_valid_cmds(repo)
+
+    if scenario_engine:
+        if not_error or (git_cmd in {'merge'} and len(parts) > 1):
+            scenario_engine = check_scenario_progress(git_cmd, stdout, stderr, scenario_engine, parts)
+            record["scenario"] = scenario_record(scenario_engine, True)
+
+    if not interactive or git_cmd in {'checkout','switch'}:
+        return record, scenario_engine
+
+    if not_error:
+        if git_cmd in {'add','commit'}:
+            animate_git_transition(git_cmd, parts, repo, pre_state)
+       
+        if git_cmd in {'merge','rebase','reset','revert'}:
+            graph_tracker.show_if_changed(git_cmd,repo)
+       
+        if git_cmd not in {'log', 'branch'}:
+            show_git_state(repo)
+
+    if not_error and feedback and input(f"\n❓ Want to see *Git Output* ? (y/n):").lower() == 'y':
+        display.panel("Git Output", feedback, border_style="dim") 
+
+    return record, scenario_engine
+
+
+def run_step(step, repo, scenario_engine):
+    """Replay one script/transcript step: make its working-tree edits, then
+    run its command headless."""
+    apply_edits(repo, step.edits)
+    record, scenario_engine = run_sim_command(step.cmd, repo, scenario_engine, interactive=False)
+    if step.edits:
+        record["edits"] = step.edits
+    return record, scenario_engine
+
+
+def find_bug(bug_id):
+    bug = bug_store().get(bug_id)
+    if not bug:
+        display.print(f"❌ Bug [red]#{bug_id}[/] not found.")
+        exit(1)
+    return bug
+
+
+def read_script(script):
+    if script == "-":
+        return parse_steps(sys.stdin.read().splitlines())
+    with open(script, "r", encoding="utf-8") as f:
+        return parse_steps(f.read().splitlines())
+
+
+def fresh_bug(bug):
+    bug = copy.deepcopy(bug)
+    if bug.get("scenario_status"):
+        bug["scenario_status"] = {"completed": False, "current_step": 0, "last_attempt": None}
+    return bug
+
+
+@contextmanager
+def scratch_simulation(prefix="gitbug-", templates=None):
+    """Run in a throwaway simulation root, sharing the template cache, so a
+    headless run never touches the learner's repos and remotes."""
+    templates = templates or str(template_cache_dir().resolve())
+    previous = simulation_root()
+    root = tempfile.mkdtemp(prefix=prefix)
+    set_simulation_root(root)
+    previous_templates = set_template_cache_dir(templates)
+    RemoteManager.reset()
+    try:
+        yield root
+    finally:
+        close_cat_files()
+        close_object_stores()
+        RemoteManager.reset()
+        set_simulation_root(previous)
+        set_template_cache_dir(previous_templates)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run_script(bug, scenario_map, script, output="jsonl"):
+    """Headless mode: run each line of `script` for `bug` and emit one result
+    record per command on stdout, without prompts, rendering or sleeps.
+
+    Each run starts the scenario from scratch in a throwaway repo and saves
+    nothing, so the same script always gives the same records.
+    """
+    try:
+        steps = read_script(script)
+    except ValueError as e:
+        display.print(f"❌ Invalid script: {e}", style="red")
+        exit(1)
+    records = []
+    bug = fresh_bug(bug)
+    display.quiet = True
+
+    try:
+        with scratch_simulation("gitbug-script-"):
+            repo = setup_git_repo_for_bug(bug['id'], bug['title'])
+            scenario_engine = check_scenario_mode(scenario_map, bug, repo, [bug], autosave=False)
+
+            for step in steps:
+                record, scenario_engine = run_step(step, repo, scenario_engine)
+                record["line"] = step.line
+                if output == "jsonl":
+                    print(json.dumps(record), flush=True)
+                else:
+                    records.append(record)
+                if record["status"] == "exit":
+                    break
+    finally:
+        display.quiet = False
+
+    if output == "json":
+        print(json.dumps(records, indent=2))
+    return records
+
+
+def simulate_git_for_bug(speed=1.0, no_animation=False, bug=None, script=None, output="jsonl", record=None):
     scenarios = load_file(SCENARIO_FILE) 
     scenario_engine = None
 
@@ -27,12 +257,24 @@ def simulate_git_for_bug():
     if scenarios:
        scenario_map = {scenario['id']: scenario for scenario in scenarios}
     
-    if not bugs:
+    if not bug_store().count():
        display.print("\nNo 🐞 bugs reported. Run [cyan]python cli.py add[/] to start\n", style="red")
        return
+
+    bug_id = bug
+    if script:
+        if bug_id is None:
+            display.print("❌ --script needs --bug <id>", style="red")
+            exit(1)
+        bug = find_bug(bug_id)
+        run_script(bug, scenario_map, script, output)
+        return
+
+    configure_animation(speed, not no_animation)
+    transcript = None
    
     try:
-        bug = bug_id_validation_prompt(bugs)
+        bug = find_bug(bug_id) if bug_id is not None else bug_id_validation_prompt()
         repo = setup_git_repo_for_bug(bug['id'],bug['title'])
 
         display.print(f"\n[green]📁 Git repo for Bug#{bug['id']}[/] [yellow]{str(repo.resolve())}[/]")
@@ -42,87 +284,35 @@ def simulate_git_for_bug():
            command_hooks["init"]()
 
         print('\n')
-        scenario_engine = check_scenario_mode(scenario_map, bug, repo, bugs)
+        scenario_engine = check_scenario_mode(scenario_map, bug, repo, [bug])
 
         display.print("\n💡 Type 'exit' anytime to stop simulation.",style="yellow")
         display.print("💡 Type 'clear' to clear screen.",style='yellow')
         display.print("\n💡 Type 'explain <git_command>' for detailed explanation.",style='cyan')
         display.print("💡 Type 'explain <git_command> [flag]' (eg:explain add -p).\n",style='cyan')    
         
+        transcript = open(record, "a", encoding="utf-8") if record else None
+        recorder = WorktreeRecorder(repo) if transcript else None
         while True:
             cmd = display_branch_prompt(repo, bug['id'])
+            # files edited at the prompt, so a replay makes the same changes first
+            edits = recorder.edits() if recorder else {}
+            result, scenario_engine = run_sim_command(cmd, repo, scenario_engine)
+            if recorder:
+                recorder.refresh()
+                if edits:
+                    result["edits"] = edits
+            if transcript and (result["status"] != "empty" or edits):
+                transcript.write(json.dumps(result) + "\n")
+                transcript.flush()
             
-            if not cmd:
-                continue
-            if cmd.lower() == "exit":
+            if result["status"] == "exit":
                 handle_exit(scenario_engine)
                 break
-            if cmd.lower() == "clear":
-                clear_screen()
-                continue
-            if cmd.lower() == 'hint' and scenario_engine:
-                scenario_engine.show_hint()
-                continue
- 
-            try:
-                parts = shlex.split(cmd)
-            except ValueError as e:
-                display.print(f"Skipping invalid command: {cmd}\nReason: {e}",style='red')
-                continue
-
-            if cmd.startswith('explain'):
-                explain_cmd(parts,command_hooks) 
-                continue
-
-            git_cmd = parts[0].lower()
-            if git_cmd == "git":
-                display.print("🏁 **git** prefix already handled automatically just run cmds (status, add, commit etc..)\n",style='green')
-                continue
-                         
-            if git_cmd not in git_valid_cmds(repo):
-                display.print(f"❌ `{git_cmd}` is not a valid Git command.\n", style="red")
-                continue
-            
-            is_cmd_supported = check_supported_cmds(parts)
-            if not is_cmd_supported:
-                continue
-            
-            pre_state = None
-            if git_cmd in {'add'}:
-                pre_state = get_modified_files(repo)
-             
-            is_syntax_correct = check_cmd_syntax(git_cmd,parts)
-            if not is_syntax_correct:
-                continue
-            
-            graph_tracker.capture_if_needed(git_cmd, repo)
-            returncode, stdout, stderr = run_git_command(repo, parts)
-            not_error, feedback = check_output(returncode, stdout, stderr, git_cmd)
-
-            if scenario_engine:
-                if not_error:
-                    scenario_engine = check_scenario_progress(git_cmd, stdout, stderr, scenario_engine, parts)
-                elif git_cmd in {'merge'} and len(parts) > 1:
-                    scenario_engine = check_scenario_progress(git_cmd, stdout, stderr, scenario_engine, parts)
-
-            if git_cmd in {'checkout','switch'}:
-                continue
-
-            if not_error:
-                if git_cmd in {'add','commit'}:
-                    animate_git_transition(git_cmd, parts, repo, pre_state)
-               
-                if git_cmd in {'merge','rebase','reset','revert'}:
-                    graph_tracker.show_if_changed(git_cmd,repo)
-               
-                if git_cmd not in {'log', 'branch'}:
-                    show_git_state(repo)
-
-            if not_error and feedback and input(f"\n❓ Want to see *Git Output* ? (y/n):").lower() == 'y':
-                display.panel("Git Output", feedback, border_style="dim") 
             
     except KeyboardInterrupt:
         handle_keyboard_interrupt(scenario_engine)
-
-
-    
+    finally:
+        if transcript:
+            transcript.close()
+        close_cat_files()
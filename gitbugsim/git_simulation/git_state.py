@@ -0,0 +1,447 @@
+import hashlib, os, re, stat, subprocess, time
+from pathlib import Path
+from gitbugsim.utils.display import display
+from .git_refs import find_git_dir, find_common_dir, read_head, resolve_ref
+from .git_index import open_index, UnsupportedIndexError, INTENT_TO_ADD, SKIP_WORKTREE
+from .object_store import get_object_store, commit_subject, ObjectNotFound
+
+LOG_DEPTH = 5
+# Working-tree edits this close to a capture may share its mtime tick, so such snapshots are never reused
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class NativeStateUnavailable(Exception):
+    """The repo uses something the in-process reader doesn't model; use `git status` instead."""
+
+
+class GitStateSnapshot:
+    """One `git status --porcelain=v2 --branch -z` call parsed into the views the simulator shows."""
+
+    def __init__(self, head_oid=None, branch=None, upstream=None, ahead=0, behind=0, ok=True):
+        self.head_oid = head_oid
+        self.branch = branch
+        self.upstream = upstream
+        self.ahead = ahead
+        self.behind = behind
+        self.ok = ok
+        self.signature = None
+        self.panel = None
+        self.staged = []
+        self.unstaged = []
+        self.unmerged = []
+        self.untracked = []
+
+    @property
+    def detached(self):
+        return self.branch is None
+
+    @property
+    def unborn(self):
+        return self.head_oid is None
+
+    @classmethod
+    def capture(cls, repo_path):
+        try:
+            return cls.capture_native(repo_path)
+        except (NativeStateUnavailable, UnsupportedIndexError, OSError):
+            return cls.capture_porcelain(repo_path)
+
+    @classmethod
+    def capture_native(cls, repo_path):
+        """Build the snapshot from .git/index, the refs and the HEAD tree without running `git status`."""
+        git_dir = find_git_dir(repo_path)
+        head = read_head(repo_path)
+        if git_dir is None or head is None:
+            raise NativeStateUnavailable("git dir not readable")
+        _check_native_config(git_dir)
+
+        branch = head[1][len("refs/heads/"):] if head[0] == "ref" and head[1].startswith("refs/heads/") else None
+        if head[0] == "ref" and branch is None:
+            raise NativeStateUnavailable("HEAD points outside refs/heads")
+
+        store = get_object_store(repo_path)
+        if store is None or store.rewritten_history:
+            raise NativeStateUnavailable("object store not readable")
+
+        head_oid = resolve_ref(repo_path, "HEAD")
+        head_tree = {}
+        try:
+            if head_oid:
+                head_tree = store.flat_tree(store.read_commit(head_oid).tree)
+            upstream = _upstream(git_dir, branch) if branch else None
+            ahead = behind = 0
+            if upstream:
+                upstream_oid = resolve_ref(repo_path, upstream[1])
+                if head_oid and upstream_oid:
+                    ahead, behind = store.ahead_behind(head_oid, upstream_oid)
+        except ObjectNotFound as e:
+            raise NativeStateUnavailable(str(e))
+
+        snapshot = cls(head_oid=head_oid, branch=branch, upstream=upstream and upstream[0], ahead=ahead, behind=behind)
+        index = open_index(repo_path)
+        entries = []
+        if index is not None:
+            with index:
+                entries = list(index.entries())
+                index_mtime = index.stat.st_mtime_ns
+
+        tracked = set()
+        for entry in entries:
+            if entry.flags & (INTENT_TO_ADD | SKIP_WORKTREE) or entry.mode == 0o160000:
+                raise NativeStateUnavailable("intent-to-add, sparse or submodule entry")
+            tracked.add(entry.path)
+            if entry.stage:
+                if not snapshot.unmerged or snapshot.unmerged[-1] != entry.path:
+                    snapshot.unmerged.append(entry.path)
+                continue
+
+            if head_tree.get(entry.path) != (entry.mode, entry.oid):
+                snapshot.staged.append(entry.path)
+            work_status = _worktree_status(repo_path, entry, index_mtime)
+            if work_status:
+                snapshot.unstaged.append((work_status, entry.path))
+
+        snapshot.staged.extend(path for path in head_tree if path not in tracked)
+        snapshot.staged.sort()
+        snapshot.untracked = _untracked_paths(repo_path, tracked)
+        return snapshot
+
+    @classmethod
+    def capture_porcelain(cls, repo_path):
+        try:
+            result = subprocess.run(
+                ["git", "status", "--porcelain=v2", "--branch", "-z"],
+                cwd=repo_path,
+                capture_output=True
+            )
+        except Exception as e:
+            display.print(f"❌ Unexpected Error: {str(e)}", style="red")
+            return cls(ok=False)
+
+        if result.returncode != 0:
+            return cls(ok=False)
+        return cls.parse(result.stdout.decode("utf-8", errors="replace"))
+
+    @classmethod
+    def parse(cls, output):
+        snapshot = cls()
+        fields = iter(output.split("\0"))
+
+        for field in fields:
+            if not field:
+                continue
+
+            kind = field[0]
+            if kind == "#":
+                snapshot._parse_header(field)
+            elif kind == "1":
+                xy, path = field[2:4], field.split(" ", 8)[8]
+                snapshot._add_change(xy, path)
+            elif kind == "2":
+                xy, path = field[2:4], field.split(" ", 9)[9]
+                snapshot._add_change(xy, path)
+                # the index no longer has the original path of a rename, like
+                # capture_native sees it: list it as a staged change as well
+                original = next(fields, None)
+                if xy[0] == "R" and original:
+                    snapshot.staged.append(original)
+            elif kind == "u":
+                snapshot.unmerged.append(field.split(" ", 10)[10])
+            elif kind == "?":
+                snapshot.untracked.append(field[2:])
+
+        snapshot.staged.sort()
+        return snapshot
+
+    def _parse_header(self, field):
+        parts = field.split(" ")
+        key = parts[1] if len(parts) > 1 else ""
+        value = parts[2] if len(parts) > 2 else ""
+
+        if key == "branch.oid":
+            self.head_oid = None if value == "(initial)" else value
+        elif key == "branch.head":
+            self.branch = None if value == "(detached)" else value
+        elif key == "branch.upstream":
+            self.upstream = value
+        elif key == "branch.ab" and len(parts) > 3:
+            self.ahead = int(parts[2].lstrip("+"))
+            self.behind = int(parts[3].lstrip("-"))
+
+    def _add_change(self, xy, path):
+        index_status, work_status = xy[0], xy[1]
+        if index_status != ".":
+            self.staged.append(path)
+        if work_status != ".":
+            self.unstaged.append((work_status, path))
+
+
+def _config_text(git_dir):
+    paths = [
+        find_common_dir(git_dir) / "config",
+        Path.home() / ".gitconfig",
+        Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config")) / "git" / "config",
+        Path("/etc/gitconfig")
+    ]
+    text = []
+    for path in paths:
+        try:
+            text.append(path.read_text(encoding="utf-8", errors="replace").lower())
+        except OSError:
+            continue
+    return "\n".join(text)
+
+
+def _check_native_config(git_dir):
+    # content filters, line-ending conversion and ignore rules change what `git status` reports
+    config = _config_text(git_dir)
+    if re.search(r"autocrlf|excludesfile|filemode\s*=\s*false|\[filter|\beol\b|sparsecheckout|showuntrackedfiles|fsmonitor", config):
+        raise NativeStateUnavailable("config changes status semantics")
+
+    common_dir = find_common_dir(git_dir)
+    if (common_dir / "info" / "attributes").exists():
+        raise NativeStateUnavailable("info/attributes present")
+    try:
+        exclude = (common_dir / "info" / "exclude").read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        exclude = ""
+    if any(line.strip() and not line.startswith("#") for line in exclude.splitlines()):
+        raise NativeStateUnavailable("info/exclude has patterns")
+
+    xdg = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config")) / "git"
+    if (xdg / "ignore").exists() or (xdg / "attributes").exists():
+        raise NativeStateUnavailable("global ignore or attributes file")
+
+
+def _upstream(git_dir, branch):
+    """(display name, tracking ref) for branch.<name>.remote/merge, or None without an upstream."""
+    try:
+        config = (find_common_dir(git_dir) / "config").read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return None
+
+    section = re.search(r'^\s*\[branch\s+"' + re.escape(branch) + r'"\]([^\[]*)', config, re.MULTILINE)
+    if not section:
+        return None
+    remote = re.search(r"^\s*remote\s*=\s*(\S+)", section.group(1), re.MULTILINE)
+    merge = re.search(r"^\s*merge\s*=\s*(\S+)", section.group(1), re.MULTILINE)
+    if not remote or not merge or not merge.group(1).startswith("refs/heads/"):
+        return None
+
+    name = merge.group(1)[len("refs/heads/"):]
+    if remote.group(1) == ".":
+        return name, merge.group(1)
+    return f"{remote.group(1)}/{name}", f"refs/remotes/{remote.group(1)}/{name}"
+
+
+def _worktree_status(repo_path, entry, index_mtime):
+    try:
+        st = os.lstat(os.path.join(repo_path, entry.path))
+    except (FileNotFoundError, NotADirectoryError):
+        return "D"
+    if stat.S_ISDIR(st.st_mode):
+        return "D"
+
+    if stat.S_ISLNK(st.st_mode):
+        mode = 0o120000
+    else:
+        mode = 0o100755 if st.st_mode & 0o100 else 0o100644
+    if mode != entry.mode:
+        return "M"
+
+    mtime = (st.st_mtime_ns // 1_000_000_000, st.st_mtime_ns % 1_000_000_000)
+    racy = st.st_mtime_ns >= index_mtime
+    if not racy and st.st_size == entry.size and mtime == entry.mtime:
+        return None
+
+    if mode == 0o120000:
+        data = os.fsencode(os.readlink(os.path.join(repo_path, entry.path)))
+    else:
+        with open(os.path.join(repo_path, entry.path), "rb") as f:
+            data = f.read()
+    oid = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+    return None if oid == entry.oid else "M"
+
+
+def _untracked_paths(repo_path, tracked):
+    tracked_dirs = set()
+    for path in tracked:
+        parts = path.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            tracked_dirs.add("/".join(parts[:i]))
+
+    untracked, stack = [], [""]
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(repo_path, rel_dir)) as it:
+            for item in it:
+                rel = f"{rel_dir}{item.name}"
+                if rel == ".git":
+                    continue
+                if item.name in {".gitignore", ".gitattributes"}:
+                    raise NativeStateUnavailable(f"{rel} present")
+                if item.is_dir(follow_symlinks=False):
+                    if rel in tracked_dirs:
+                        stack.append(f"{rel}/")
+                    elif _contains_file(item.path):
+                        # like `git status`, a wholly untracked directory is listed once
+                        untracked.append(f"{rel}/")
+                elif rel not in tracked:
+                    untracked.append(rel)
+
+    untracked.sort()
+    return untracked
+
+
+def _contains_file(path):
+    for _, _, filenames in os.walk(path):
+        if ".gitignore" in filenames:
+            raise NativeStateUnavailable("ignore rules inside an untracked directory")
+        if filenames:
+            return True
+    return False
+
+
+class _Signer:
+    """Collects stat data for a signature.
+
+    Git rewrites the index and refs through a lockfile rename, so their inode
+    changes on every write. Working-tree files can be edited in place within
+    one mtime tick, so the newest of those mtimes is remembered for the racy check.
+    """
+
+    def __init__(self):
+        self.newest = 0
+
+    def stat(self, path, name=None, racy=False):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if racy:
+            self.newest = max(self.newest, st.st_mtime_ns)
+        return (name or str(path), st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def tree(self, root, skip=None, racy=False):
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            if skip:
+                dirnames[:] = [d for d in dirnames if d != skip]
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                entry = self.stat(full, os.path.relpath(full, root), racy)
+                if entry:
+                    entries.append(entry)
+        entries.sort()
+        return tuple(entries)
+
+
+def refs_signature(repo_path, signer=None):
+    signer = signer or _Signer()
+    git_dir = find_git_dir(repo_path) or Path(repo_path) / ".git"
+    common_dir = find_common_dir(git_dir)
+    try:
+        head = (git_dir / "HEAD").read_bytes()
+    except OSError:
+        head = None
+
+    return (
+        head,
+        signer.stat(common_dir / "packed-refs"),
+        signer.tree(common_dir / "refs"),
+        signer.stat(common_dir / "config")
+    )
+
+
+def state_signature(repo_path, signer=None):
+    signer = signer or _Signer()
+    git_dir = find_git_dir(repo_path) or Path(repo_path) / ".git"
+    return (
+        refs_signature(repo_path, signer),
+        signer.stat(git_dir / "index"),
+        signer.tree(repo_path, skip=".git", racy=True)
+    )
+
+
+class GitStateTracker:
+    """Keeps the latest snapshot per repo and reuses it while the repo's stat signature is unchanged.
+
+    The signature covers .git/index, HEAD, packed-refs, loose refs, the repo
+    config and every working-tree file, so an unchanged repo is re-rendered
+    without spawning git. GraphManager keys its graph cache on the refs part.
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self._logs = {}
+
+    def snapshot(self, repo_path):
+        key = str(repo_path)
+        signature = state_signature(repo_path)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        started = time.time_ns()
+        snapshot = GitStateSnapshot.capture(repo_path)
+        # `git status` may refresh the index, so sign what it left behind
+        signer = _Signer()
+        signature = state_signature(repo_path, signer)
+        if snapshot.ok and signer.newest < started - RACY_WINDOW_NS:
+            snapshot.signature = signature
+        self._snapshots[key] = snapshot
+        return snapshot
+
+    def refs_key(self, repo_path):
+        return refs_signature(repo_path)
+
+    def invalidate(self, repo_path=None):
+        if repo_path is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(str(repo_path), None)
+
+    def commit_log(self, repo_path, max_count=LOG_DEPTH):
+        snapshot = self.snapshot(repo_path)
+        if snapshot.ok and snapshot.unborn:
+            return []
+
+        key = str(repo_path)
+        depth = max(max_count, LOG_DEPTH)
+        cached = self._logs.get(key)
+
+        # Only re-run `git log` when HEAD moved since the last lookup
+        if not snapshot.ok or cached is None or cached[0] != snapshot.head_oid or cached[1] < depth:
+            commits = read_commit_log(repo_path, depth)
+            if not snapshot.ok:
+                return commits[:max_count]
+            cached = (snapshot.head_oid, depth, commits)
+            self._logs[key] = cached
+
+        return cached[2][:max_count]
+
+
+def read_commit_log(repo_path, max_count):
+    store = get_object_store(repo_path)
+    head_oid = resolve_ref(repo_path, "HEAD")
+    if store is not None and head_oid and not store.rewritten_history:
+        try:
+            abbrev = store.abbrev_len()
+            return [f"{c.oid[:abbrev]}: {commit_subject(c)}" for c in store.walk([head_oid], max_count)]
+        except (ObjectNotFound, OSError):
+            pass
+
+    try:
+        result = subprocess.run(
+            ["git", "log", "--pretty=format:%h: %s", f"--max-count={max_count}"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True
+        )
+        return result.stdout.splitlines()
+    except Exception as e:
+        display.print(f"❌ Unexpected Error: {str(e)}", style="red")
+        return []
+
+
+state_tracker = GitStateTracker()
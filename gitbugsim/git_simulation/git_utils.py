@@ -1,14 +1,23 @@
-import os, re, subprocess
+import os, re, subprocess, json, hashlib, shutil
 from pathlib import Path  
 from .not_supported_cmds import no_sup_cmd_hooks  
 from gitbugsim.utils.display import display
 from gitbugsim.utils.common import false_errors , warning_phrases
 from .git_error_hooks import check_error  
+from .git_state import state_tracker
+from .cat_file import get_cat_file
+from .object_store import parse_tree
+from .git_refs import read_head, short_ref_name
+from .git_index import read_index_entries, UnsupportedIndexError
+from .cmd_suggest import BKTree, suggest
+from .sandbox_pool import claim_sandbox, init_bug_repo
+from gitbugsim.utils.config import bug_repo_base, git_cmds_cache
 
 
-BUG_REPO_BASE = Path("./user_simulation/local_repos")
 EXPLANATION_PATH = Path(__file__).resolve().parent.parent / "explanations"
 
+_valid_cmds = {}
+
 
 def load_explanation(command_path, cmd_name):
     filepath = EXPLANATION_PATH / Path(*command_path.split("/")).with_suffix(".md")
@@ -55,43 +64,15 @@ def check_supported_cmds(parts):
 
 
 
-def get_git_status(repo_path, cmd):
-    try:
-        result = subprocess.run(
-            cmd,
-            cwd=repo_path,
-            capture_output=True,
-            text=True
-        )
-        return result.stdout.splitlines()
-    except Exception as e:
-        display.print(f"❌ Unexpected Error: {str(e)}", style="red")
-        return []
-
-
-def get_modified_files(repo_path):
-    lines = get_git_status(repo_path,["git", "status", "--short"])
-    symbols = {
-        "?": "[red]?? - Untracked files (new)[/]" , 
-        "M": "[red]M - Modified/Unstaged (already tracked)[/]", 
-        "U": "[red]U - Unmerged files (conflict)[/]",
-        "D": "[red]D - Deleted files (already tracked)[/]"
-    }
+def get_modified_files(repo_path, snapshot=None):
+    snapshot = snapshot or state_tracker.snapshot(repo_path)
     files = {
-        "[red]?? - Untracked files (new)[/]": [],
-        "[red]M - Modified/Unstaged (already tracked)[/]": [],
-        "[red]U - Unmerged files (conflict)[/]": [],
-        "[red]D - Deleted (already tracked)[/]": []
+        "[red]?? - Untracked files (new)[/]": snapshot.untracked,
+        "[red]M - Modified/Unstaged (already tracked)[/]": [f for status, f in snapshot.unstaged if status == "M"],
+        "[red]U - Unmerged files (conflict)[/]": snapshot.unmerged,
+        "[red]D - Deleted files (already tracked)[/]": [f for status, f in snapshot.unstaged if status == "D"]
     }
 
-    for line in lines:
-        working_status, filename = line[1:2].strip(), line[3:].strip()  
-        if working_status not in symbols:
-            continue
-
-        label = symbols.get(working_status)
-        files[label].append(filename)
-
     files_flat = []
     for category, f in files.items():
         if f:
@@ -102,34 +83,177 @@ def get_modified_files(repo_path):
     return files_flat if len(files_flat) != 0 else ["(no untracked, unstaged files)"]
 
 
-def get_staged_files(repo_path):
-    files = get_git_status(repo_path,["git", "diff", "--cached", "--name-only"])
-    return [f"\n📥  {file.strip()}" for file in files] if len(files) != 0 else ["(no files staged for commits)"]
+def get_staged_files(repo_path, snapshot=None):
+    snapshot = snapshot or state_tracker.snapshot(repo_path)
+    files = snapshot.staged + snapshot.unmerged
+    return [f"\n📥  {file}" for file in files] if len(files) != 0 else ["(no files staged for commits)"]
 
 
 def get_commit_log(repo_path,max_count=5):
-    commits = get_git_status(repo_path,["git", "log", f"--pretty=format:%h: %s", f"--max-count={max_count}"])
+    commits = state_tracker.commit_log(repo_path, max_count)
     return [f"\n{commit.strip()}" for commit in commits] if len(commits) != 0 else ["(no commits)"]
 
 
+def get_branch_status(repo_path, snapshot=None):
+    snapshot = snapshot or state_tracker.snapshot(repo_path)
+    if not snapshot.ok:
+        return ""
+
+    branch = snapshot.branch or "HEAD-detached"
+    if not snapshot.upstream:
+        return f"🌿 {branch} (no upstream)"
+    return f"🌿 {branch} → {snapshot.upstream}  ↑{snapshot.ahead} ↓{snapshot.behind}"
+
+
+def resolve_rev(repo_path, rev):
+    info = get_cat_file(repo_path).info(rev)
+    return info[0] if info else None
+
+
+def index_blob_oid(repo_path, path, stage=0):
+    for entry in read_index_entries(repo_path):
+        if entry.path == path and entry.stage == stage:
+            return entry.oid
+    return None
+
+
+def get_unmerged_entries(repo_path):
+    try:
+        entries = read_index_entries(repo_path)
+    except (UnsupportedIndexError, OSError):
+        returncode, stdout, stderr = run_git_command(repo_path, ["ls-files", "-u", "-z"])
+        unmerged = {}
+        for line in stdout.split("\0"):
+            if not line:
+                continue
+            info, path = line.split("\t", 1)
+            _, oid, stage = info.split()
+            unmerged.setdefault(path, {})[int(stage)] = oid
+        return unmerged
+
+    unmerged = {}
+    for entry in entries:
+        if entry.stage:
+            unmerged.setdefault(entry.path, {})[entry.stage] = entry.oid
+    return unmerged
+
+
+def read_blob(repo_path, spec):
+    # `:path` and `:N:path` come straight from the index, so cat-file never re-reads it
+    match = re.fullmatch(r":(?:([0-3]):)?(.+)", spec)
+    if match:
+        try:
+            oid = index_blob_oid(repo_path, match.group(2), int(match.group(1) or 0))
+            if oid is None:
+                return None
+            spec = oid
+        except (UnsupportedIndexError, OSError):
+            pass
+
+    obj = get_cat_file(repo_path).read(spec)
+    if obj is None or obj[1] != "blob":
+        return None
+    return obj[2].decode("utf-8", errors="replace")
+
+
+def list_tree(repo_path, rev):
+    obj = get_cat_file(repo_path).read(f"{rev}^{{tree}}")
+    if obj is None:
+        return []
+    return parse_tree(obj[2], len(obj[0]) // 2)
+
+
+def path_changed_in_commit(repo_path, rev, path):
+    blob = resolve_rev(repo_path, f"{rev}:{path}")
+    return blob is not None and blob != resolve_rev(repo_path, f"{rev}^:{path}")
+
+
 def clear_screen():
     os.system("cls" if os.name == "nt" else "clear")
 
 
+def git_build_signature():
+    git_exe = shutil.which("git")
+    if not git_exe:
+        return "unknown"
+    st = os.stat(os.path.realpath(git_exe))
+    return f"{os.path.realpath(git_exe)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def alias_config_signature(repo_dir):
+    config_files = [
+        Path("/etc/gitconfig"),
+        Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config")) / "git" / "config",
+        Path.home() / ".gitconfig",
+        Path(repo_dir) / ".git" / "config"
+    ]
+    aliases = set()
+
+    for config in config_files:
+        try:
+            text = config.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+
+        in_alias = False
+        for line in text.splitlines():
+            line = line.strip()
+            if line.startswith("["):
+                in_alias = line.lower().startswith("[alias]")
+            elif in_alias and "=" in line:
+                aliases.add(line.split("=", 1)[0].strip().lower())
+
+    return hashlib.sha1(",".join(sorted(aliases)).encode()).hexdigest()
+
+
+def list_git_cmds(repo_dir):
+    key = f"{git_build_signature()}|{alias_config_signature(repo_dir)}"
+    try:
+        cached = json.loads(git_cmds_cache().read_text())
+    except (OSError, ValueError):
+        cached = {}
+
+    if key in cached:
+        return set(cached[key])
+
+    result = subprocess.run(
+        ["git", "--list-cmds=main,others,alias,nohelpers"],
+        cwd=repo_dir,
+        capture_output=True,
+        text=True
+    )
+    cmds = set(result.stdout.strip().splitlines())
+    if result.returncode == 0 and cmds:
+        cache = git_cmds_cache()
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        cache.write_text(json.dumps({key: sorted(cmds)}))
+    return cmds
+
+
 def git_valid_cmds(repo_dir):
+    key = str(repo_dir)
+    if key in _valid_cmds:
+        return _valid_cmds[key][0]
+
     try:
-        result = subprocess.run(
-            ["git", "--list-cmds=main,others,alias,nohelpers"],
-            cwd=repo_dir,
-            capture_output=True,
-            text=True
-        )
-        cmds = set(result.stdout.strip().splitlines())
-        return cmds
+        cmds = list_git_cmds(repo_dir)
     except Exception as e:
         display.print(f"⚠️  Could not load Git commands: {e}", style="red")
         return {"init", "status", "add", "commit", "log", "merge", "checkout", "branch"}
 
+    _valid_cmds[key] = (cmds, BKTree(sorted(cmds)))
+    return cmds
+
+
+def forget_valid_cmds(repo_dir):
+    _valid_cmds.pop(str(repo_dir), None)
+
+
+def suggest_git_cmds(repo_dir, word):
+    git_valid_cmds(repo_dir)
+    entry = _valid_cmds.get(str(repo_dir))
+    return suggest(entry[1], word) if entry else []
+
 
 
 def handle_git_error(stderr, command):
@@ -139,35 +263,40 @@ def handle_git_error(stderr, command):
     for hook in handlers:
         if any(keyword in stderr_lower for keyword in hook["matchers"]):
             hook["handler"](stderr)
-            return True
+            return hook["handler"].__name__
 
-    return False  
+    return None  
 
 
 def check_output(returncode, stdout, stderr, git_cmd):
+    """Returns (not_error, feedback, error_hook) where error_hook names the
+    git_error handler that explained the failure, if any."""
     stderr_lower = stderr.lower()
     stdout_lower = stdout.lower()
 
     for cmd, phrase in false_errors:
         if git_cmd == cmd and phrase in stdout_lower:
-            if handle_git_error(stdout, git_cmd):
-                return False, None
+            error_hook = handle_git_error(stdout, git_cmd)
+            if error_hook:
+                return False, None, error_hook
             if stdout:
                 display.print(f"\n{stdout}")
-            return False, None
+            return False, None, None
     
     for cmd, phrase in warning_phrases:
         if git_cmd == cmd and phrase in stderr_lower:
-            if handle_git_error(stderr, git_cmd):
-                return False, None
+            error_hook = handle_git_error(stderr, git_cmd)
+            if error_hook:
+                return False, None, error_hook
             display.print(f"[yellow]Git says:[/]\n{stderr}")
-            return False, None
+            return False, None, None
   
     if returncode != 0:
-        if handle_git_error(stderr, git_cmd):
-            return False, None
+        error_hook = handle_git_error(stderr, git_cmd)
+        if error_hook:
+            return False, None, error_hook
         display.print(f"[red]Git error:[/]\n{stderr}")
-        return False, None
+        return False, None, None
 
     from .git_feedback_hooks import feedback_hooks 
     feedback = None 
@@ -176,7 +305,7 @@ def check_output(returncode, stdout, stderr, git_cmd):
            feedback = feedback_hooks[git_cmd](parts='',repo_path='')
     else:
         feedback = stdout
-    return True , feedback
+    return True, feedback, None
 
 
 def run_git_command(repo_dir, command_list):
@@ -195,23 +324,24 @@ def run_git_command(repo_dir, command_list):
 
 
 def setup_git_repo_for_bug(bug_id,bug_title):
-    repo_path = BUG_REPO_BASE / f"bug_{bug_id}"
-    repo_path.mkdir(parents=True, exist_ok=True)
-    
-    sanitized_title = re.sub(r'[^a-zA-Z0-9_-]', '', bug_title.lower().replace(" ", "-"))
-    file1_path = repo_path / f"{sanitized_title}.py"
-    file1_path.touch(exist_ok=True)
+    repo_path = bug_repo_base() / f"bug_{bug_id}"
 
-    file2_path = repo_path / "main.py"
-    file2_path.touch(exist_ok=True)
+    # a sandbox from `cli.py provision` is already initialised
+    if not repo_path.exists() and claim_sandbox(bug_id, bug_title, repo_path):
+        return repo_path
 
-    git_dir = repo_path / ".git"
-    if not git_dir.exists():
-        subprocess.run(["git", "init"], cwd=repo_path, check=True)
+    init_output = init_bug_repo(repo_path, bug_title)
+    if init_output:
+        display.print(init_output)
     return repo_path
 
 
 def get_current_branch(repo):
+    head = read_head(repo)
+    if head is not None:
+        kind, value = head
+        return short_ref_name(value) if kind == 'ref' else 'detach-head'
+
     returncode, stdout, stderr = run_git_command(repo, ["symbolic-ref", "--short", "HEAD"])
     if returncode == 0:
         return stdout
@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from rich.markup import escape
+from .git_refs import short_ref_name
+
+MAX_LANES = 6
+CACHE_SIZE = 32
+
+_layouts = OrderedDict()
+
+
+def _focus_commits(dag, version, changes):
+    focus = set()
+    if changes:
+        focus.update(changes.added)
+        focus.update(changes.unreachable)
+        for old, new in changes.moved_refs.values():
+            focus.update(oid for oid in (old, new) if oid)
+    if version.head:
+        focus.add(version.head)
+    return {oid for oid in focus if oid in dag.nodes}
+
+
+def _window(dag, version, focus, depth):
+    """Commits reachable from the version's tips whose generation lies within
+    `depth` of the focus commits, plus whether anything was cut above/below."""
+    generations = [dag.nodes[oid].generation for oid in focus]
+    low = min(generations, default=0) - depth
+    high = max(generations, default=0) + depth
+
+    visible, seen, cut_above, cut_below = set(), set(), False, False
+    stack = [oid for oid in dag.tips(version) if oid in dag.nodes]
+    while stack:
+        oid = stack.pop()
+        if oid in seen:
+            continue
+        seen.add(oid)
+        node = dag.nodes[oid]
+        if node.generation < low:
+            cut_below = True
+            continue
+        if node.generation > high:
+            cut_above = True
+        else:
+            visible.add(oid)
+        stack.extend(p for p in node.parents if p in dag.nodes)
+
+    # generations strictly decrease towards parents, so this is a topological order
+    ordered = sorted(visible, key=lambda oid: (-dag.nodes[oid].generation, -dag.nodes[oid].commit_time, oid))
+    return ordered, cut_above, cut_below
+
+
+def _draw(chars):
+    # two columns per lane: the lane itself and the gap to its right
+    text = "".join(chars).rstrip()
+    if len(text) > 2 * MAX_LANES:
+        text = text[:2 * MAX_LANES] + "…"
+    return text
+
+
+def _layout(dag, ordered):
+    """Assign each commit a lane in one pass; yields (graph, oid) rows where oid
+    is None for the connector rows drawn between lane changes."""
+    visible = set(ordered)
+    lanes = []
+
+    for oid in ordered:
+        if oid in lanes:
+            col = lanes.index(oid)
+        elif None in lanes:
+            col = lanes.index(None)
+        else:
+            col = len(lanes)
+            lanes.append(None)
+        lanes[col] = oid
+
+        # lines that were waiting for this commit converge into its lane first
+        merging = [i for i, lane in enumerate(lanes) if lane == oid and i != col]
+        if merging:
+            chars = [" "] * (2 * len(lanes))
+            for i, lane in enumerate(lanes):
+                if lane and i not in merging:
+                    chars[2 * i] = "|"
+            for i in merging:
+                chars[2 * i - 1 if i > col else 2 * i + 1] = "/" if i > col else "\\"
+                lanes[i] = None
+            yield _draw(chars), None
+
+        chars = [" "] * (2 * len(lanes))
+        for i, lane in enumerate(lanes):
+            chars[2 * i] = "*" if i == col else ("|" if lane else " ")
+        yield _draw(chars), oid
+
+        parents = [p for p in dag.nodes[oid].parents if p in visible]
+        lanes[col] = parents[0] if parents else None
+        opened = []
+        for parent in parents[1:]:
+            if parent in lanes:
+                continue
+            slot = next((i for i in range(col + 1, len(lanes)) if lanes[i] is None), None)
+            if slot is None:
+                slot = len(lanes)
+                lanes.append(None)
+            lanes[slot] = parent
+            opened.append(slot)
+
+        if opened:
+            chars = [" "] * (2 * len(lanes))
+            for i, lane in enumerate(lanes):
+                if lane and i not in opened:
+                    chars[2 * i] = "|"
+            for i in opened:
+                chars[2 * i - 1 if i > col else 2 * i + 1] = "\\" if i > col else "/"
+            yield _draw(chars), None
+
+        while lanes and lanes[-1] is None:
+            lanes.pop()
+
+
+def _labels(version, moved):
+    labels = {}
+    for name, oid in sorted(version.refs.items()):
+        label = short_ref_name(name)
+        if name == version.head_ref:
+            label = f"HEAD -> {label}"
+        if name in moved:
+            label = f"[bold yellow]{escape(label)}[/]"
+        else:
+            label = f"[cyan]{escape(label)}[/]"
+        labels.setdefault(oid, []).append(label)
+
+    if version.head and version.head_ref is None:
+        labels.setdefault(version.head, []).insert(0, "[bold yellow]HEAD[/]")
+    return labels
+
+
+def render_window(dag, version, changes=None, depth=3):
+    """Render the part of `version`'s history around the commits in `changes`
+    as rich-markup lines, `git log --graph --oneline` style.
+
+    Layouts are cached by the version's refs and the change set, so flipping
+    back and forth between the same states re-renders for free.
+    """
+    moved = frozenset(changes.moved_refs) if changes else frozenset()
+    added = frozenset(changes.added) if changes else frozenset()
+    lost = frozenset(changes.unreachable) if changes else frozenset()
+    key = (dag.repo_path, frozenset(version.refs.items()), version.head, version.head_ref,
+           moved, added, lost, depth)
+    if key in _layouts:
+        _layouts.move_to_end(key)
+        return _layouts[key]
+
+    focus = _focus_commits(dag, version, changes)
+    ordered, cut_above, cut_below = _window(dag, version, focus, depth)
+    labels = _labels(version, moved)
+
+    lines = ["⋮"] if cut_above else []
+    for graph, oid in _layout(dag, ordered):
+        if oid is None:
+            lines.append(graph)
+            continue
+
+        node = dag.nodes[oid]
+        if oid in added:
+            graph = graph.replace("*", "[bold green]*[/]", 1)
+        elif oid in lost:
+            graph = graph.replace("*", "[red]*[/]", 1)
+
+        refs = f" ({', '.join(labels[oid])})" if oid in labels else ""
+        subject = f"[dim red]{escape(node.subject)}[/]" if oid in lost else escape(node.subject)
+        if oid in added and len(node.parents) > 1:
+            subject += " [bold green](new merge)[/]"
+        lines.append(f"{graph} [yellow]{oid[:7]}[/]{refs} {subject}")
+    if cut_below:
+        lines.append("⋮")
+
+    _layouts[key] = lines
+    if len(_layouts) > CACHE_SIZE:
+        _layouts.popitem(last=False)
+    return lines
@@ -1,38 +1,93 @@
 from .git_utils import run_git_command
+from .git_state import state_tracker
+from .commit_dag import get_commit_dag, DagUnavailable
+from .git_refs import short_ref_name
+from .graph_layout import render_window
+from .object_store import ObjectNotFound
 from .visualizer import show_graph_comparision
 from gitbugsim.utils.display import display
+from gitbugsim.utils.config import GRAPH_WINDOW_DEPTH
+from rich.markup import escape
 
 class GraphManager:
 
     def __init__(self):
        self.before_graph = None
        self.before_commit = None
+       self.before_version = None
        self.last_cmd = None
+       self.depth = GRAPH_WINDOW_DEPTH
+       self._graphs = {}
 
     def get_commit_hash(self,repo):
+        snapshot = state_tracker.snapshot(repo)
+        if snapshot.ok:
+            return snapshot.head_oid
+
         returncode, stdout, stderr = run_git_command(repo, ["rev-parse", "HEAD"])
         if returncode == 0:
             return stdout
 
     def get_graph(self,repo):
+        refs_key = state_tracker.refs_key(repo)
+        cached = self._graphs.get(str(repo))
+        if cached and cached[0] == refs_key:
+            return cached[1]
+
         returncode, stdout, stderr = run_git_command(repo, ["log", "--graph", "--all", "--oneline", '--decorate'])
         if returncode == 0:
-            return stdout
+            graph = escape(stdout)
+            self._graphs[str(repo)] = (refs_key, graph)
+            return graph
+    
+    def get_dag_version(self, repo):
+        try:
+            return get_commit_dag(repo).refresh()
+        except (DagUnavailable, ObjectNotFound, OSError):
+            return None
+
+    def describe_changes(self, repo, changes):
+        dag = get_commit_dag(repo)
+        lines = []
+
+        for name, (old, new) in sorted(changes.moved_refs.items()):
+            old_label = old[:7] if old else "(new)"
+            new_label = new[:7] if new else "(deleted)"
+            lines.append(f"[yellow]🔀 {short_ref_name(name)}[/]: {old_label} → {new_label}")
+        for oid in changes.added:
+            node = dag.nodes[oid]
+            kind = "merge commit" if len(node.parents) > 1 else "commit"
+            lines.append(f"[green]➕ New {kind}[/] {oid[:7]}: {escape(node.subject)}")
+        for oid in changes.unreachable:
+            lines.append(f"[red]👻 No longer reachable[/] {oid[:7]}: {escape(dag.nodes[oid].subject)}")
+
+        return lines
     
     def capture_if_needed(self, cmd, repo):
         graph_cmds = {'merge','rebase','reset','revert'}
 
         if cmd in graph_cmds:
-            if self.last_cmd != cmd or self.before_graph is None:
-              self.before_graph = self.get_graph(repo)
-              self.before_commit = self.get_commit_hash(repo)
+            if self.last_cmd != cmd or (self.before_version is None and self.before_graph is None):
+              self.before_version = self.get_dag_version(repo)
+              if self.before_version is None:
+                  self.before_graph = self.get_graph(repo)
+                  self.before_commit = self.get_commit_hash(repo)
               self.last_cmd = cmd
     
     def show_if_changed(self, cmd, repo):
-        if self.before_graph:
-            after_commit = self.get_commit_hash(repo)
+        if self.before_version:
+            dag = get_commit_dag(repo)
+            after_version = self.get_dag_version(repo)
+            if after_version:
+                changes = dag.diff(self.before_version, after_version)
+                if changes.head_moved or changes.moved_refs:
+                    before_graph = "\n".join(render_window(dag, self.before_version, changes, self.depth))
+                    after_graph = "\n".join(render_window(dag, after_version, changes, self.depth))
+                    show_graph_comparision(before_graph, after_graph, cmd, self.describe_changes(repo, changes))
+            self.reset()
 
-            if self.before_commit != after_commit:
+        elif self.before_graph:
+            if self.before_commit != self.get_commit_hash(repo):
                 after_graph = self.get_graph(repo)
                 show_graph_comparision(self.before_graph, after_graph, cmd)
             
@@ -41,6 +96,7 @@ class GraphManager:
     def reset(self):
         self.before_graph = None
         self.before_commit = None
+        self.before_version = None
         self.last_cmd = None
 
 graph_tracker = GraphManager()
\ No newline at end of file
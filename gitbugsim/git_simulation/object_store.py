@@ -0,0 +1,496 @@
+import heapq, mmap, os, struct, zlib
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+from .git_refs import find_git_dir, find_common_dir
+
+Commit = namedtuple("Commit", "oid tree parents author committer commit_time message")
+
+OBJ_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+OFS_DELTA, REF_DELTA = 6, 7
+OID_LEN = 20
+# git's value for commits written after the last commit-graph: they sort
+# before every graphed commit, since none of those can be their descendant
+GENERATION_INFINITY = 0xFFFFFFFF
+
+
+class ObjectNotFound(Exception):
+    pass
+
+
+def _inflate(buf, pos, chunk=65536):
+    decomp = zlib.decompressobj()
+    out = []
+    while not decomp.eof:
+        piece = buf[pos:pos + chunk]
+        if not piece:
+            raise ObjectNotFound("truncated zlib stream")
+        out.append(decomp.decompress(piece))
+        pos += chunk
+    return b"".join(out)
+
+
+def _apply_delta(base, delta):
+    def varint(pos):
+        value = shift = 0
+        while True:
+            byte = delta[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value, pos
+
+    _, pos = varint(0)
+    result_size, pos = varint(pos)
+    out = bytearray()
+
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (1 << (4 + i)):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise ObjectNotFound("invalid delta opcode")
+
+    if len(out) != result_size:
+        raise ObjectNotFound("delta result size mismatch")
+    return bytes(out)
+
+
+class PackFile:
+    """A `.pack` with its v2 `.idx`, both memory-mapped."""
+
+    def __init__(self, idx_path):
+        self.idx_path = idx_path
+        self.pack_path = idx_path.with_suffix(".pack")
+        self._idx = self._map(idx_path)
+        self._pack = self._map(self.pack_path)
+
+        if self._idx[:4] != b"\xfftOc" or struct.unpack_from(">I", self._idx, 4)[0] != 2:
+            raise ObjectNotFound(f"unsupported pack index {idx_path.name}")
+        self._fanout = struct.unpack_from(">256I", self._idx, 8)
+        self.count = self._fanout[-1]
+        self._oid_base = 8 + 256 * 4
+        self._offset_base = self._oid_base + self.count * (OID_LEN + 4)
+        self._large_base = self._offset_base + self.count * 4
+
+    @staticmethod
+    def _map(path):
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _oid_at(self, i):
+        start = self._oid_base + i * OID_LEN
+        return self._idx[start:start + OID_LEN]
+
+    def find_offset(self, oid_bytes):
+        lo = self._fanout[oid_bytes[0] - 1] if oid_bytes[0] else 0
+        hi = self._fanout[oid_bytes[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = self._oid_at(mid)
+            if probe < oid_bytes:
+                lo = mid + 1
+            elif probe > oid_bytes:
+                hi = mid
+            else:
+                offset = struct.unpack_from(">I", self._idx, self._offset_base + mid * 4)[0]
+                if offset & 0x80000000:
+                    index = offset & 0x7FFFFFFF
+                    offset = struct.unpack_from(">Q", self._idx, self._large_base + index * 8)[0]
+                return offset
+        return None
+
+    def read_at(self, offset, store):
+        buf = self._pack
+        byte = buf[offset]
+        obj_type = (byte >> 4) & 0x7
+        pos = offset + 1
+        while byte & 0x80:  # object size varint; the inflated data tells us the size anyway
+            byte = buf[pos]
+            pos += 1
+
+        if obj_type == OFS_DELTA:
+            byte = buf[pos]
+            pos += 1
+            base_offset = byte & 0x7F
+            while byte & 0x80:
+                byte = buf[pos]
+                pos += 1
+                base_offset = ((base_offset + 1) << 7) | (byte & 0x7F)
+            base_type, base = store._read_packed(self, offset - base_offset)
+            return base_type, _apply_delta(base, _inflate(buf, pos))
+
+        if obj_type == REF_DELTA:
+            base_oid = buf[pos:pos + OID_LEN].hex()
+            base_type, base = store.read(base_oid)
+            return base_type, _apply_delta(base, _inflate(buf, pos + OID_LEN))
+
+        if obj_type not in OBJ_TYPES:
+            raise ObjectNotFound(f"bad pack object type {obj_type}")
+        return OBJ_TYPES[obj_type], _inflate(buf, pos)
+
+    def close(self):
+        self._idx.close()
+        self._pack.close()
+
+
+class CommitGraph:
+    """Reader for a single `objects/info/commit-graph` file (topological generations)."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        signature, version, hash_version, chunk_count = struct.unpack_from(">4sBBB", self._buf, 0)
+        if signature != b"CGPH" or version != 1 or hash_version != 1:
+            raise ObjectNotFound("unsupported commit-graph")
+
+        chunks = {}
+        for i in range(chunk_count + 1):
+            chunk_id, offset = struct.unpack_from(">4sQ", self._buf, 8 + i * 12)
+            chunks[chunk_id] = offset
+        if b"OIDF" not in chunks or b"OIDL" not in chunks or b"CDAT" not in chunks:
+            raise ObjectNotFound("commit-graph is missing required chunks")
+
+        self._fanout = struct.unpack_from(">256I", self._buf, chunks[b"OIDF"])
+        self._oidl = chunks[b"OIDL"]
+        self._cdat = chunks[b"CDAT"]
+        self.count = self._fanout[-1]
+
+    def generation(self, oid):
+        oid_bytes = bytes.fromhex(oid)
+        lo = self._fanout[oid_bytes[0] - 1] if oid_bytes[0] else 0
+        hi = self._fanout[oid_bytes[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self._oidl + mid * OID_LEN
+            probe = self._buf[start:start + OID_LEN]
+            if probe < oid_bytes:
+                lo = mid + 1
+            elif probe > oid_bytes:
+                hi = mid
+            else:
+                gen_time = struct.unpack_from(">Q", self._buf, self._cdat + mid * (OID_LEN + 16) + OID_LEN + 8)[0]
+                return gen_time >> 34
+        return GENERATION_INFINITY
+
+    def close(self):
+        self._buf.close()
+
+
+def parse_tree(data, oid_len=OID_LEN):
+    entries, pos = [], 0
+    while pos < len(data):
+        space = data.index(b" ", pos)
+        nul = data.index(b"\0", space)
+        mode = data[pos:space].decode()
+        name = data[space + 1:nul].decode("utf-8", errors="replace")
+        oid = data[nul + 1:nul + 1 + oid_len].hex()
+        obj_type = "tree" if mode == "40000" else "commit" if mode == "160000" else "blob"
+        entries.append((mode, obj_type, oid, name))
+        pos = nul + 1 + oid_len
+    return entries
+
+
+def parse_commit(oid, data):
+    header, _, message = data.partition(b"\n\n")
+    tree, parents, author, committer = None, [], "", ""
+
+    for line in header.split(b"\n"):
+        if line.startswith(b" "):
+            continue  # continuation of a multi-line header such as gpgsig
+        key, _, value = line.partition(b" ")
+        if key == b"tree":
+            tree = value.decode()
+        elif key == b"parent":
+            parents.append(value.decode())
+        elif key == b"author":
+            author = value.decode("utf-8", errors="replace")
+        elif key == b"committer":
+            committer = value.decode("utf-8", errors="replace")
+
+    try:
+        commit_time = int(committer.rsplit(" ", 2)[-2])
+    except (IndexError, ValueError):
+        commit_time = 0
+
+    return Commit(oid, tree, tuple(parents), author, committer, commit_time,
+                  message.decode("utf-8", errors="replace"))
+
+
+def commit_subject(commit):
+    # same as `%s`: the first paragraph folded onto one line
+    return " ".join(commit.message.strip().split("\n\n", 1)[0].split("\n")) if commit.message.strip() else ""
+
+
+class ObjectStore:
+    """Read-only access to loose and packed objects with an LRU of decoded objects."""
+
+    def __init__(self, objects_dir, cache_size=2048, commit_cache_size=8192):
+        self.objects_dir = Path(objects_dir)
+        self.cache_size = cache_size
+        self.commit_cache_size = commit_cache_size
+        self._cache = OrderedDict()
+        self._commits = OrderedDict()
+        self._bases = OrderedDict()
+        self._flat_trees = OrderedDict()
+        self._packs = {}
+        self._pack_dir_stat = None
+        self._graph = None
+        self._graph_stat = None
+
+        # grafts and replace refs change history in ways we don't model
+        info = self.objects_dir.parent
+        self.rewritten_history = (info / "info" / "grafts").exists() or (info / "refs" / "replace").exists()
+
+    def _refresh_packs(self):
+        pack_dir = self.objects_dir / "pack"
+        try:
+            st = os.stat(pack_dir)
+        except OSError:
+            return []
+        signature = (st.st_mtime_ns, st.st_ino)
+        if signature != self._pack_dir_stat:
+            seen = set()
+            for idx_path in sorted(pack_dir.glob("*.idx")):
+                seen.add(idx_path)
+                if idx_path not in self._packs and idx_path.with_suffix(".pack").exists():
+                    self._packs[idx_path] = PackFile(idx_path)
+            for idx_path in list(self._packs):
+                if idx_path not in seen:
+                    self._packs.pop(idx_path).close()
+            self._pack_dir_stat = signature
+        return list(self._packs.values())
+
+    def _read_loose(self, oid):
+        path = self.objects_dir / oid[:2] / oid[2:]
+        try:
+            raw = zlib.decompress(path.read_bytes())
+        except (OSError, zlib.error):
+            return None
+        header, _, data = raw.partition(b"\0")
+        return header.split(b" ")[0].decode(), data
+
+    def _read_packed(self, pack, offset):
+        # delta bases are shared by many objects, so keep recently inflated ones by pack offset
+        key = (pack.idx_path, offset)
+        if key in self._bases:
+            self._bases.move_to_end(key)
+            return self._bases[key]
+        obj = pack.read_at(offset, self)
+        self._bases[key] = obj
+        if len(self._bases) > 256:
+            self._bases.popitem(last=False)
+        return obj
+
+    def read(self, oid):
+        if oid in self._cache:
+            self._cache.move_to_end(oid)
+            return self._cache[oid]
+
+        obj = self._read_loose(oid)
+        if obj is None:
+            oid_bytes = bytes.fromhex(oid)
+            for _ in range(2):
+                for pack in self._refresh_packs():
+                    offset = pack.find_offset(oid_bytes)
+                    if offset is not None:
+                        obj = self._read_packed(pack, offset)
+                        break
+                if obj is not None:
+                    break
+                self._pack_dir_stat = None  # a repack may have just happened
+        if obj is None:
+            raise ObjectNotFound(oid)
+
+        self._cache[oid] = obj
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return obj
+
+    def read_commit(self, oid):
+        if oid in self._commits:
+            self._commits.move_to_end(oid)
+            return self._commits[oid]
+
+        obj_type, data = self.read(oid)
+        if obj_type != "commit":
+            raise ObjectNotFound(f"{oid} is a {obj_type}, not a commit")
+        commit = parse_commit(oid, data)
+        self._commits[oid] = commit
+        if len(self._commits) > self.commit_cache_size:
+            self._commits.popitem(last=False)
+        return commit
+
+    def flat_tree(self, tree_oid):
+        """Every non-tree entry below `tree_oid` as {path: (mode, oid)}."""
+        if tree_oid in self._flat_trees:
+            self._flat_trees.move_to_end(tree_oid)
+            return self._flat_trees[tree_oid]
+
+        flat, stack = {}, [("", tree_oid)]
+        while stack:
+            prefix, oid = stack.pop()
+            obj_type, data = self.read(oid)
+            if obj_type != "tree":
+                raise ObjectNotFound(f"{oid} is a {obj_type}, not a tree")
+            for mode, entry_type, entry_oid, name in parse_tree(data):
+                if entry_type == "tree":
+                    stack.append((f"{prefix}{name}/", entry_oid))
+                else:
+                    flat[f"{prefix}{name}"] = (int(mode, 8), entry_oid)
+
+        self._flat_trees[tree_oid] = flat
+        if len(self._flat_trees) > 8:
+            self._flat_trees.popitem(last=False)
+        return flat
+
+    def commit_graph(self):
+        path = self.objects_dir / "info" / "commit-graph"
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._graph = None
+            return None
+        signature = (st.st_ino, st.st_mtime_ns)
+        if signature != self._graph_stat:
+            try:
+                self._graph = CommitGraph(path)
+            except (ObjectNotFound, OSError, struct.error):
+                self._graph = None
+            self._graph_stat = signature
+        return self._graph
+
+    def generation(self, oid):
+        graph = self.commit_graph()
+        return graph.generation(oid) if graph else GENERATION_INFINITY
+
+    def walk(self, starts, limit=None, generation_order=False):
+        """Commits reachable from `starts`, newest first.
+
+        By default the queue is ordered by committer date, matching `git log`.
+        With `generation_order` and a commit-graph it is ordered by generation
+        number, so a commit is never emitted before one of its descendants.
+        """
+        use_graph = generation_order and self.commit_graph() is not None
+        heap, seen, emitted = [], set(), 0
+
+        def push(oid):
+            if oid in seen:
+                return
+            seen.add(oid)
+            try:
+                commit = self.read_commit(oid)
+            except ObjectNotFound:
+                return  # e.g. the boundary of a shallow clone
+            generation = self.generation(oid) if use_graph else 0
+            heapq.heappush(heap, (-generation, -commit.commit_time, len(seen), commit))
+
+        for oid in starts:
+            self.read_commit(oid)  # a missing start is an error, a missing parent is a shallow boundary
+            push(oid)
+
+        while heap and (limit is None or emitted < limit):
+            commit = heapq.heappop(heap)[-1]
+            yield commit
+            emitted += 1
+            for parent in commit.parents:
+                push(parent)
+
+    def ahead_behind(self, left, right):
+        """Commits only reachable from `left` and only from `right`, like `rev-list --left-right --count`."""
+        use_graph = self.commit_graph() is not None
+        flags, heap = {}, []
+
+        def push(oid, flag):
+            old = flags.get(oid, 0)
+            if old | flag == old:
+                return
+            flags[oid] = old | flag
+            try:
+                commit = self.read_commit(oid)
+            except ObjectNotFound:
+                return
+            generation = self.generation(oid) if use_graph else 0
+            heapq.heappush(heap, (-generation, -commit.commit_time, len(flags), oid))
+
+        push(left, 1)
+        push(right, 2)
+        # once every queued commit is reachable from both sides nothing below can change the counts
+        while heap and any(flags[entry[-1]] != 3 for entry in heap):
+            oid = heapq.heappop(heap)[-1]
+            for parent in self.read_commit(oid).parents:
+                push(parent, flags[oid])
+
+        ahead = sum(1 for flag in flags.values() if flag == 1)
+        behind = sum(1 for flag in flags.values() if flag == 2)
+        return ahead, behind
+
+    def approximate_count(self):
+        count = sum(pack.count for pack in self._refresh_packs())
+        # sample every 16th loose fan-out directory, like git's own estimate
+        for i in range(0, 256, 16):
+            try:
+                count += len(os.listdir(self.objects_dir / f"{i:02x}")) * 16
+            except OSError:
+                continue
+        return count
+
+    def abbrev_len(self):
+        # git's default: enough hex digits that a collision is unlikely, never fewer than 7
+        return max(7, (self.approximate_count().bit_length() + 1) // 2)
+
+    def close(self):
+        for pack in self._packs.values():
+            pack.close()
+        self._packs.clear()
+        for cache in (self._cache, self._commits, self._bases, self._flat_trees):
+            cache.clear()
+        if self._graph:
+            self._graph.close()
+            self._graph = None
+
+
+_stores = {}
+
+
+def get_object_store(repo_path):
+    git_dir = find_git_dir(repo_path)
+    if git_dir is None:
+        return None
+
+    objects_dir = find_common_dir(git_dir) / "objects"
+    key = str(objects_dir.resolve())
+    store = _stores.get(key)
+    if store is None:
+        store = ObjectStore(objects_dir)
+        _stores[key] = store
+    return store
+
+
+def close_object_stores(repo_path=None):
+    if repo_path is None:
+        keys = list(_stores)
+    else:
+        git_dir = find_git_dir(repo_path)
+        if git_dir is None:
+            return
+        keys = [str((find_common_dir(git_dir) / "objects").resolve())]
+
+    for key in keys:
+        store = _stores.pop(key, None)
+        if store:
+            store.close()
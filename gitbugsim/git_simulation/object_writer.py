@@ -0,0 +1,161 @@
+import hashlib, os, tempfile, time, zlib
+from pathlib import Path
+from .git_refs import read_raw_ref
+from .object_store import get_object_store, parse_tree, ObjectNotFound
+
+TREE_MODE = "40000"
+BLOB_MODE = "100644"
+
+
+class RefConflict(Exception):
+    """The ref moved (or is locked) since the caller read it."""
+
+
+def write_object(objects_dir, obj_type, data):
+    """Store `data` as a loose object, the same way `git hash-object -w` does."""
+    raw = f"{obj_type} {len(data)}\0".encode() + data
+    oid = hashlib.sha1(raw).hexdigest()
+    path = Path(objects_dir) / oid[:2] / oid[2:]
+    if path.exists():
+        return oid
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix="tmp_obj_", dir=path.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(zlib.compress(raw))
+    os.chmod(tmp, 0o444)
+    os.replace(tmp, path)
+    return oid
+
+
+def encode_tree(entries):
+    # git sorts tree entries as if directory names ended with "/"
+    def key(entry):
+        mode, name, _ = entry
+        return name + "/" if mode == TREE_MODE else name
+
+    return b"".join(
+        f"{mode} {name}".encode() + b"\0" + bytes.fromhex(oid)
+        for mode, name, oid in sorted(entries, key=key)
+    )
+
+
+def ident(name, email, when=None):
+    when = int(time.time() if when is None else when)
+    offset = time.localtime(when).tm_gmtoff // 60
+    sign = "+" if offset >= 0 else "-"
+    return f"{name} <{email}> {when} {sign}{abs(offset) // 60:02d}{abs(offset) % 60:02d}"
+
+
+def encode_commit(tree, parents, author, committer, message):
+    lines = [f"tree {tree}"] + [f"parent {p}" for p in parents] + [f"author {author}", f"committer {committer}"]
+    return ("\n".join(lines) + "\n\n" + message.rstrip("\n") + "\n").encode()
+
+
+def update_ref(git_dir, refname, new_oid, old_oid=None):
+    """Point `refname` at `new_oid` with git's lockfile protocol.
+
+    When `old_oid` is given the update only happens if the ref still holds
+    it (an empty `old_oid` means the ref must not exist yet), like
+    `git update-ref <ref> <new> <old>`.
+    """
+    path = Path(git_dir) / refname
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock = path.with_name(path.name + ".lock")
+    try:
+        fd = os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        raise RefConflict(f"{refname} is locked")
+
+    try:
+        raw = read_raw_ref(Path(git_dir), refname)
+        current = raw[1] if raw and raw[0] == "oid" else None
+        if old_oid is not None and (current or "") != old_oid:
+            raise RefConflict(f"{refname} is at {current}, expected {old_oid}")
+        with os.fdopen(fd, "w") as f:
+            f.write(new_oid + "\n")
+        fd = None
+        os.replace(lock, path)
+    finally:
+        if fd is not None:
+            os.close(fd)
+        if lock.exists():
+            lock.unlink()
+
+
+def _update_tree(store, objects_dir, tree_oid, parts, blob_oid):
+    entries = {}
+    if tree_oid:
+        _, data = store.read(tree_oid)
+        entries = {name: (mode, oid) for mode, _, oid, name in parse_tree(data)}
+
+    name = parts[0]
+    if len(parts) == 1:
+        if blob_oid is None:
+            entries.pop(name, None)
+        else:
+            mode = entries[name][0] if name in entries and entries[name][0] != TREE_MODE else BLOB_MODE
+            entries[name] = (mode, blob_oid)
+    else:
+        sub_tree = entries[name][1] if name in entries and entries[name][0] == TREE_MODE else None
+        new_sub = _update_tree(store, objects_dir, sub_tree, parts[1:], blob_oid)
+        if new_sub is None:
+            entries.pop(name, None)
+        else:
+            entries[name] = (TREE_MODE, new_sub)
+
+    if not entries:
+        return None
+    return write_object(objects_dir, "tree", encode_tree([(mode, n, oid) for n, (mode, oid) in entries.items()]))
+
+
+def read_file_at(git_dir, commit_oid, path):
+    """Content of `path` in `commit_oid`, or None if it doesn't exist there."""
+    if not commit_oid:
+        return None
+    store = get_object_store(git_dir)
+    tree = store.read_commit(commit_oid).tree
+    for part in path.split("/"):
+        _, data = store.read(tree)
+        match = [oid for mode, _, oid, name in parse_tree(data) if name == part]
+        if not match:
+            return None
+        tree = match[0]
+    obj_type, data = store.read(tree)
+    return data.decode("utf-8", errors="surrogateescape") if obj_type == "blob" else None
+
+
+def commit_changes(git_dir, branch, changes, message, author, parent=None):
+    """Commit `changes` onto `branch` of a (bare) repo without a working tree.
+
+    `changes` maps a path to its new text, to a function of the old text, or
+    to None to delete it. Returns the new commit id, or None when nothing
+    changed. Raises RefConflict if the branch moved while we were writing.
+    """
+    git_dir = Path(git_dir)
+    refname = f"refs/heads/{branch}"
+    store = get_object_store(git_dir)
+    objects_dir = git_dir / "objects"
+
+    if parent is None:
+        raw = read_raw_ref(git_dir, refname)
+        parent = raw[1] if raw and raw[0] == "oid" else None
+    try:
+        base_tree = store.read_commit(parent).tree if parent else None
+    except ObjectNotFound:
+        raise RefConflict(f"{refname} points at a missing commit")
+
+    tree = base_tree
+    for path, change in changes.items():
+        if callable(change):
+            change = change(read_file_at(git_dir, parent, path) or "")
+        blob = None if change is None else write_object(objects_dir, "blob", change.encode("utf-8", errors="surrogateescape"))
+        tree = _update_tree(store, objects_dir, tree, path.split("/"), blob)
+
+    tree = tree or write_object(objects_dir, "tree", b"")
+    if tree == base_tree:
+        return None
+
+    commit = write_object(objects_dir, "commit", encode_commit(tree, [parent] if parent else [], author, author, message))
+    update_ref(git_dir, refname, commit, parent or "")
+    return commit
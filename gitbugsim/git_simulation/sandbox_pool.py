@@ -0,0 +1,136 @@
+import multiprocessing, os, re, shutil, subprocess, time, uuid
+from concurrent.futures import ProcessPoolExecutor
+from gitbugsim.utils.config import SCENARIO_FILE, sandbox_pool_dir
+from gitbugsim.utils.display import display
+from gitbugsim.utils.file_ops import load_file, bug_store
+from .git_refs import read_head, short_ref_name
+
+
+def bug_file_name(bug_title):
+    return re.sub(r'[^a-zA-Z0-9_-]', '', bug_title.lower().replace(" ", "-")) + ".py"
+
+
+def init_bug_repo(repo_path, bug_title):
+    """Files and `git init` every bug repo starts with."""
+    repo_path.mkdir(parents=True, exist_ok=True)
+    (repo_path / bug_file_name(bug_title)).touch(exist_ok=True)
+    (repo_path / "main.py").touch(exist_ok=True)
+
+    if not (repo_path / ".git").exists():
+        result = subprocess.run(["git", "init"], cwd=repo_path, check=True, capture_output=True, text=True)
+        return result.stdout.strip()
+    return ""
+
+
+def pool_path(bug_id):
+    return sandbox_pool_dir() / f"bug_{bug_id}"
+
+
+def ready_sandboxes(bug_id):
+    try:
+        return sorted(p for p in pool_path(bug_id).iterdir() if not p.name.startswith("."))
+    except OSError:
+        return []
+
+
+def claim_sandbox(bug_id, bug_title, repo_path):
+    """Move a provisioned repo for `bug_id` to `repo_path`.
+
+    `os.rename` is atomic, so when several learners start at once each
+    sandbox goes to exactly one of them. Returns False if none is ready.
+    """
+    expected = bug_file_name(bug_title)
+    for sandbox in ready_sandboxes(bug_id):
+        if not (sandbox / expected).exists():
+            continue  # provisioned before the bug was renamed
+        repo_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.rename(sandbox, repo_path)
+        except OSError:
+            continue  # taken by someone else, or a different filesystem
+        return True
+    return False
+
+
+def build_sandbox(bug_id, bug_title):
+    """Create one ready sandbox; built under `.staging` and renamed into the
+    pool so a half-built repo is never handed out."""
+    staging = sandbox_pool_dir() / ".staging" / uuid.uuid4().hex
+    try:
+        init_bug_repo(staging, bug_title)
+        head = read_head(staging)
+        target = pool_path(bug_id) / staging.name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(staging, target)
+    except (OSError, subprocess.CalledProcessError):
+        shutil.rmtree(staging, ignore_errors=True)
+        return None
+    return short_ref_name(head[1]) if head and head[0] == "ref" else None
+
+
+def top_up(bug_id, bug_title, pool_size):
+    """Fill the bug's pool up to `pool_size`; returns (built, branches seen)."""
+    built, branches = 0, set()
+    for _ in range(max(pool_size - len(ready_sandboxes(bug_id)), 0)):
+        branch = build_sandbox(bug_id, bug_title)
+        if branch is None:
+            break
+        built += 1
+        branches.add(branch)
+    return bug_id, built, branches
+
+
+def parse_bug_ids(spec):
+    ids = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        ids.update(range(int(start), int(end or start) + 1))
+    return ids
+
+
+def warm_templates(bugs, branches):
+    # local import: scenario modules import git_simulation
+    from gitbugsim.scenarios.scenario_hook import scenario_hook
+    from gitbugsim.scenarios.scenario_templates import get_template
+
+    scenarios = load_file(SCENARIO_FILE) or []
+    types = {scenario['id']: scenario['type'] for scenario in scenarios}
+    for bug in bugs:
+        name = types.get(bug.get('scenario_id'))
+        if name in scenario_hook:
+            for branch in branches.get(bug['id'], ()):
+                get_template(name, branch)
+
+
+def provision_cli(bugs, workers=None, pool_size=2, watch=None):
+    try:
+        wanted = parse_bug_ids(bugs)
+    except ValueError:
+        display.print(f"❌ Invalid --bugs value [red]{bugs}[/] (eg: 1-200 or 1,4,7-9)")
+        exit(1)
+
+    targets = [bug for bug in bug_store().all() if bug['id'] in wanted]
+    if not targets:
+        display.print("❌ None of those bugs exist.", style="red")
+        return
+
+    while True:
+        branches = {}
+        total = 0
+        # spawn, like grade: workers import top_up cleanly on every platform
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            jobs = [pool.submit(top_up, bug['id'], bug['title'], pool_size) for bug in targets]
+            for job in jobs:
+                bug_id, built, seen = job.result()
+                total += built
+                branches[bug_id] = seen
+
+        warm_templates(targets, branches)
+        display.print(f"✅ Provisioned [cyan]{total}[/] sandboxes for {len(targets)} bugs → [yellow]{sandbox_pool_dir()}[/]")
+
+        if not watch:
+            break
+        time.sleep(watch)
@@ -0,0 +1,107 @@
+import json, os
+from collections import namedtuple
+from pathlib import Path, PurePosixPath
+
+# one command to run, with the working-tree edits to make just before it
+Step = namedtuple("Step", "line cmd ts edits")
+
+
+def check_edit_path(path):
+    """Edits name repo-relative files and never reach into `.git`."""
+    parts = PurePosixPath(path).parts
+    if not parts or PurePosixPath(path).is_absolute() or ".." in parts or parts[0] == ".git":
+        raise ValueError(f"can't edit '{path}': paths must be inside the repo and outside .git")
+    return path
+
+
+def apply_edits(repo, edits):
+    """Write `{path: content}` into the working tree; None deletes the file."""
+    for path, content in edits.items():
+        target = Path(repo) / check_edit_path(path)
+        if content is None:
+            target.unlink(missing_ok=True)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+
+
+def parse_steps(lines):
+    """Steps of a script or transcript.
+
+    Lines are plain commands, JSON records as written by `simulate --script`
+    / `--record` (`{"cmd": ..., "edits": {path: content}}`), or edit
+    directives: `{"write": path, "content": text}` and `{"delete": path}`.
+    Directives apply before the next command. Raises ValueError on a line
+    it can't read.
+    """
+    steps, pending = [], {}
+    number = 0
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if not line.startswith("{"):
+            steps.append(Step(number, line, None, pending))
+            pending = {}
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}")
+        if "write" in record:
+            pending[check_edit_path(record["write"])] = record.get("content", "")
+        elif "delete" in record:
+            pending[check_edit_path(record["delete"])] = None
+        elif "cmd" in record:
+            pending.update({check_edit_path(path): content for path, content in (record.get("edits") or {}).items()})
+            steps.append(Step(number, record["cmd"], record.get("ts"), pending))
+            pending = {}
+        else:
+            raise ValueError(f"line {number}: expected a cmd, write or delete record")
+
+    if pending:
+        steps.append(Step(number, "", None, pending))
+    return steps
+
+
+def _scan(repo):
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(repo):
+        dirnames[:] = [name for name in dirnames if name != ".git"]
+        for name in filenames:
+            full = os.path.join(dirpath, name)
+            try:
+                st = os.lstat(full)
+            except OSError:
+                continue
+            files[Path(full).relative_to(repo).as_posix()] = (st.st_mtime_ns, st.st_size, st.st_ino)
+    return files
+
+
+class WorktreeRecorder:
+    """Notices the files a learner edits between commands, so `--record`
+    transcripts replay with the same working tree."""
+
+    def __init__(self, repo):
+        self.repo = Path(repo)
+        self.seen = _scan(self.repo)
+
+    def edits(self):
+        """{path: content or None} changed since the last call or refresh()."""
+        now = _scan(self.repo)
+        edits = {path: None for path in self.seen if path not in now}
+        for path, signature in now.items():
+            if self.seen.get(path) != signature:
+                try:
+                    with open(self.repo / path, "r", encoding="utf-8", errors="replace", newline="") as f:
+                        edits[path] = f.read()
+                except OSError:
+                    continue
+        self.seen = now
+        return edits
+
+    def refresh(self):
+        # after a command: whatever git itself wrote isn't the learner's edit
+        self.seen = _scan(self.repo)
@@ -1,18 +1,66 @@
-import subprocess, os, time, re
-from .git_utils import get_staged_files, get_modified_files, get_commit_log, get_transitions, run_git_command
+import subprocess, os, time, re, threading
+from .git_utils import get_staged_files, get_modified_files, get_commit_log, get_branch_status, get_transitions, run_git_command
+from .git_state import state_tracker
 from .git_feedback_hooks import feedback_hooks
 from collections import defaultdict
 from gitbugsim.utils.display import display
 from rich.table import Table
+from rich.text import Text
+from rich.live import Live
 import shutil 
 
+FRAME_DELAY = 0.5
+animation = {"enabled": True, "speed": 1.0}
+
 
 def get_git_state(repo_path):   
-    return {
-        "working_dir": get_modified_files(repo_path),
-        "staging_area": get_staged_files(repo_path),
-        "commit_history": get_commit_log(repo_path)
-    }
+    snapshot = state_tracker.snapshot(repo_path)
+    if snapshot.panel is None:
+        snapshot.panel = {
+            "branch": get_branch_status(repo_path, snapshot),
+            "working_dir": get_modified_files(repo_path, snapshot),
+            "staging_area": get_staged_files(repo_path, snapshot),
+            "commit_history": get_commit_log(repo_path)
+        }
+    return snapshot.panel
+
+
+def configure_animation(speed=1.0, enabled=True):
+    animation["speed"] = speed
+    animation["enabled"] = enabled and speed > 0
+
+
+def play_frames(frames, background=None):
+    """Show transition frames while `background` runs on a worker thread.
+
+    Returns as soon as both the frames and the background work are done.
+    """
+    worker = None
+    if background:
+        worker = threading.Thread(target=background, daemon=True)
+        worker.start()
+
+    if not animation["enabled"] or not display.rich_available:
+        for frame in frames:
+            display.print(frame)
+    else:
+        delay = FRAME_DELAY / animation["speed"]
+        with Live(Text(""), refresh_per_second=20) as live:
+            for i in range(len(frames)):
+                if i:
+                    time.sleep(delay)
+                live.update(Text.from_markup("\n".join(frames[:i + 1])))
+
+    if worker:
+        worker.join()
+
+
+def warm_git_state(repo_path):
+    # errors here surface again when the state table is drawn on the main thread
+    try:
+        get_git_state(repo_path)
+    except Exception:
+        pass
 
 
 def get_clean_files(file_list):
@@ -50,9 +98,7 @@ def animate_git_transition(cmd_type, parts, repo_path, pre_state):
         return
     
     print("\n🎬 Transition")
-    for f in flow:
-        display.print(f)
-        time.sleep(0.5)
+    play_frames(flow, background=lambda: warm_git_state(repo_path))
 
     feedback_func = feedback_hooks.get(cmd_type)
     if feedback_func:
@@ -66,6 +112,7 @@ def show_git_state(repo_path):
     working = state["working_dir"]
     staging = state["staging_area"]
     commits = state["commit_history"]
+    branch = state["branch"]
 
     max_len = max(len(working), len(staging), len(commits))
     terminal_width = shutil.get_terminal_size().columns
@@ -76,7 +123,8 @@ def show_git_state(repo_path):
             title="📊 Git State Visualization [yellow][For Explanation run : git> explain git-state][/]",
             show_header=True,
             show_lines=False,
-            border_style="dim"
+            border_style="dim",
+            caption=branch or None
         )
         table.add_column("📁 Working Directory",header_style='dim',justify="center", width=col_width)
         table.add_column("📥  Staging Area",justify="center",header_style='green', style='green', width=col_width)
@@ -90,10 +138,10 @@ def show_git_state(repo_path):
 
         display.rprint(table)
     else:
-        col_width = max((total_width - 6) // 3, 20)  
+        col_width = max((terminal_width - 6) // 3, 20)  
         header = f"{'📁 Working Dir'.ljust(col_width)} {'📥  Staging Area'.ljust(col_width)} {'🗃  Commit History'}"
         sep = "─" * (terminal_width)
-        lines = [header, sep]
+        lines = [branch, header, sep] if branch else [header, sep]
         for i in range(max_len):
             wd = working[i] if i < len(working) else ""
             st = staging[i] if i < len(staging) else ""
@@ -103,7 +151,14 @@ def show_git_state(repo_path):
 
 
 
-def show_graph_comparision(before, after, cmd):
+def fit_markup(line, width):
+    # pad/crop by visible width so markup in graph lines doesn't skew the columns
+    text = Text.from_markup(line)
+    text.truncate(width, overflow="ellipsis", pad=True)
+    return text.markup
+
+
+def show_graph_comparision(before, after, cmd, summary=None):
 
     before_lines = before.strip().splitlines()
     after_lines = after.strip().splitlines()
@@ -120,7 +175,11 @@ def show_graph_comparision(before, after, cmd):
     for i in range(max_len):
         left = before_lines[i] if i < len(before_lines) else ""
         right = after_lines[i] if i < len(after_lines) else ""
-        lines.append(f"{left.ljust(width)} | {right.ljust(width)}")
+        lines.append(f"{fit_markup(left, width)} | {fit_markup(right, width)}")
+
+    if summary:
+        lines.append(f"\n{'-'*width}")
+        lines.extend(summary)
 
     content = "\n".join(lines)
     print('\n')
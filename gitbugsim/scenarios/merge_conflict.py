@@ -1,7 +1,26 @@
 import os, re
-from gitbugsim.git_simulation.git_utils import run_git_command, get_commit_log, get_current_branch
+from gitbugsim.git_simulation.git_utils import (
+    run_git_command, get_commit_log, get_current_branch, 
+    read_blob, path_changed_in_commit, get_unmerged_entries
+)
 from gitbugsim.utils.display import display
 from .remote_engine import RemoteManager  
+from .scenario_templates import scenario_template, get_template
+
+INITIAL_CSS = """
+    .login-button {
+       position: relative;
+       padding: 10px 20px;
+       background-color: #4CAF50;
+       color: white;
+    }"""
+
+TEAMMATE_CHANGE = {
+    "file_path": "login.css",
+    "original": "position: relative",
+    "change": "position: fixed",
+    "commit_msg": "Teammate: change to fixed"
+}
 
 
 def clean_commit_msg(commits):
@@ -13,37 +32,35 @@ def clean_commit_msg(commits):
     return clean
 
 
-def check_fetched(repo,cmd):
-    custom_fetch_path = os.path.join(repo, '.git/FETCH_HEAD_CUSTOM')
-    
-    if not os.path.exists(custom_fetch_path):
-        run_git_command(repo,['fetch','origin'])
-        with open(custom_fetch_path, "w") as f:
-            f.write('fetched')
-        
-        if cmd != 'fetch':
-            return True 
+def check_fetched(remote, cmd):
+    # fetch on the learner's behalf only if origin/* is behind the remote
+    if remote.is_stale():
+        remote.fetch()
+        return cmd != 'fetch'
 
     return False
 
 
+@scenario_template("merge_conflict")
+def build_merge_conflict_template(template):
+    template.write("login.css", INITIAL_CSS)
+    template.commit(["login.css"], "Initial button styles")
+    template.mark_start()
+    template.teammate_commit(**TEAMMATE_CHANGE)
+    template.checkpoint("teammate")
+
+
 def setup_merge_conflict(bug, repo):
     css_path = os.path.join(repo, "login.css")
-    initial_css = """
-    .login-button {
-       position: relative;
-       padding: 10px 20px;
-       background-color: #4CAF50;
-       color: white;
-    }"""
+    initial_css = INITIAL_CSS
 
     with open(css_path, "w") as f:
         f.write(initial_css)
 
     
     remote_branch = get_current_branch(repo)
-    RemoteManager.init(repo, bug, remote_branch)
-    remote = RemoteManager.get(f'bug-{bug['id']}') 
+    RemoteManager.init(repo, bug, remote_branch, get_template("merge_conflict", remote_branch))
+    remote = RemoteManager.get(f"bug-{bug['id']}") 
     
     commits = clean_commit_msg(get_commit_log(repo))
     if 'Initial button styles' not in commits:
@@ -82,8 +99,7 @@ def check_commit_with_fix(command, output, repo, parts):
     if "commit" not in command:
         return False
     
-    returncode, stdout, stderr = run_git_command(repo, ["show", "--pretty=format:", "--name-only", "HEAD"])
-    if returncode != 0 or 'login.css' not in stdout:
+    if not path_changed_in_commit(repo, "HEAD", "login.css"):
         display.panel("[red]❌ login.css Not Committed[/]",
     f"""
 The file [yellow]login.css[/] was not included in your last commit!
@@ -105,7 +121,7 @@ If amending doesn't work in this simulation:
         return False
 
     
-    returncode, content, stderr = run_git_command(repo, ["show", "HEAD:login.css"])
+    content = read_blob(repo, "HEAD:login.css") or ""
     absolute = re.search(r"position\s*:\s*absolute", content, re.IGNORECASE)
     
     if not absolute:
@@ -136,14 +152,9 @@ If amending doesn't work in this simulation:
         return False
 
     
-    remote = RemoteManager.get('bug-1')
+    remote = RemoteManager.for_repo(repo)
     if not remote.teammate_pushed:
-        remote.teammate_setup(
-            file_path="login.css",
-            original="position: relative",
-            change="position: fixed",
-            commit_msg="Teammate: change to fixed"
-        )
+        remote.teammate_setup(**TEAMMATE_CHANGE, checkpoint="teammate")
 
     return True
 
@@ -153,10 +164,10 @@ def check_merge_attempted(command, output, repo, parts):
     if command not in {'merge','fetch'} or 'not something we can merge' in output:
         return False   
 
-    remote = RemoteManager.get('bug-1')
+    remote = RemoteManager.for_repo(repo)
     current_branch = get_current_branch(repo)
 
-    if check_fetched(repo,command):
+    if check_fetched(remote, command):
         display.panel(f"⚠️ Detected: Your local `{remote.remote_branch}` is outdated!",
     f"""
 We Ran [green]git fetch origin[/] and checked that your branch is outdated.
@@ -229,7 +240,7 @@ This ensures you're merging the **latest remote teammate commits**, not stale lo
         with open(css_path, "r") as f:
             content = f.read()
         
-        if '<<<<<<<' in content and '>>>>>>>' in content:
+        if 'login.css' in get_unmerged_entries(repo) or ('<<<<<<<' in content and '>>>>>>>' in content):
             display.panel(
                 "[red]⚠️ Merge Conflict Detected![/]",
                 f"""
@@ -298,12 +309,12 @@ def check_conflict_resolved(command, output, repo, parts):
         return False
 
     is_commit_cmd = "commit" in command
-    remote = RemoteManager.get('bug-1')
+    remote = RemoteManager.for_repo(repo)
 
     source = "HEAD:login.css" if is_commit_cmd else ":login.css"
-    returncode, content, stderr = run_git_command(repo, ["show", source])
+    content = read_blob(repo, source)
 
-    if returncode != 0:
+    if content is None:
         if is_commit_cmd:
             display.panel("[red]❌ login.css not found in last commit[/]", 
                       "Make sure you committed the resolved file.", "red")
@@ -313,12 +324,12 @@ def check_conflict_resolved(command, output, repo, parts):
     fixed = re.search(r"position\s*:\s*fixed", content, re.IGNORECASE) 
    
     if absolute and not fixed:
-        returncode, head_content, _ = run_git_command(repo, ["show", "HEAD:login.css"])
+        head_content = read_blob(repo, "HEAD:login.css")
         
-        absolute_found = re.search(r"position\s*:\s*absolute", head_content, re.IGNORECASE)
-        fixed_found = re.search(r"position\s*:\s*fixed", head_content, re.IGNORECASE)
+        absolute_found = head_content and re.search(r"position\s*:\s*absolute", head_content, re.IGNORECASE)
+        fixed_found = head_content and re.search(r"position\s*:\s*fixed", head_content, re.IGNORECASE)
            
-        if returncode == 0 and absolute_found and not fixed_found:
+        if absolute_found and not fixed_found:
             if command == 'add':
                display.panel("[blue]💡 Git Insight: Why `login.css` disappeared after `git add`[/]",
         f"""
@@ -362,7 +373,7 @@ Git is smart enough to skip redundant history — and now, so are you. 🧠
 """,'dim')  
             
             remote.cleanup()
-            RemoteManager.reset(1)
+            RemoteManager.reset(remote.bug_id)
             return True      
     
     
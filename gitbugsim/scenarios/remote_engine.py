@@ -1,22 +1,35 @@
 import os
 import shutil
+from collections import OrderedDict
 from pathlib import Path
 import json
 from gitbugsim.utils.display import display
 from gitbugsim.git_simulation.git_utils import run_git_command, get_current_branch
-
-BUG_REMOTE_BASE = Path('./user_simulation/remote_teammate')
+from gitbugsim.git_simulation.git_refs import list_refs
+from gitbugsim.git_simulation.object_writer import commit_changes, read_file_at, ident
+from gitbugsim.git_simulation.cat_file import close_cat_files
+from gitbugsim.git_simulation.object_store import close_object_stores
+from gitbugsim.utils.config import (
+    bug_remote_base, remote_state_dir, remote_state_file,
+    TEAMMATE_NAME, TEAMMATE_EMAIL, MAX_LIVE_REMOTES
+)
+from .scenario_templates import get_template, read_ref
 
 class RemoteEngine:
 
-    def __init__(self, repo, bug, branch):
+    def __init__(self, repo, bug, branch, template=None):
         self.user_repo = repo
-        self.remote_path = BUG_REMOTE_BASE / 'remote_repos' / f'bug-{bug['id']}'
-        self.teammate_path = BUG_REMOTE_BASE / 'teammate_repos' / f'bug-{bug['id']}'
+        self.bug_id = f"bug-{bug['id']}"
+        self.remote_path = bug_remote_base() / 'remote_repos' / f"bug-{bug['id']}"
+        self.teammate_path = bug_remote_base() / 'teammate_repos' / f"bug-{bug['id']}"
         self.teammate_pushed = False
         self.remote_branch = branch  
+        self.template = template
     
     def setup(self):
+        if self.template and self.template.materialize(self.user_repo, self.remote_path, self.git_path(self.remote_path)):
+            return
+
         self.remote_path.mkdir(parents=True, exist_ok=True)
 
         git_refs = self.remote_path / 'refs'
@@ -29,51 +42,60 @@ class RemoteEngine:
 
         run_git_command(self.user_repo, ["remote", "add", "origin", self.git_path(self.remote_path)])
         run_git_command(self.user_repo, ["fetch", "origin"])
+
+    def remote_tips(self):
+        return list_refs(self.remote_path, "refs/heads/") or {}
+
+    def tracking_tips(self):
+        tips = list_refs(self.user_repo, "refs/remotes/origin/") or {}
+        prefix = len("refs/remotes/origin/")
+        return {f"refs/heads/{name[prefix:]}": oid for name, oid in tips.items() if name != "refs/remotes/origin/HEAD"}
+
+    def is_stale(self):
+        """True when the remote has commits the learner hasn't fetched yet.
+        Only reads refs on both sides, so it's cheap enough for every check."""
+        tracking = self.tracking_tips()
+        return any(tracking.get(name) != oid for name, oid in self.remote_tips().items())
+
+    def fetch(self):
+        """Fetch origin, re-adding it first if the learner's repo lost it."""
+        returncode = run_git_command(self.user_repo, ["fetch", "origin"])[0]
+        if returncode != 0:
+            self.setup()
     
     
-    def teammate_setup(self, file_path=None, original=None, change=None, commit_msg="Teammate:"):
+    def teammate_commit(self, changes, message, branch=None):
+        """Commit `changes` (see `commit_changes`) straight into the bare
+        remote as the teammate, without a clone or working tree."""
+        author = ident(TEAMMATE_NAME, TEAMMATE_EMAIL)
+        return commit_changes(self.remote_path, branch or self.remote_branch, changes, message, author)
 
-        done_flag = self.teammate_path / ".teammate_pushed"
-        if done_flag.exists():
+    def teammate_history(self, commits, branch=None):
+        """Script several teammate commits in a row; `commits` is a list of
+        (changes, message) pairs. Returns the ids of the commits made."""
+        made = [self.teammate_commit(changes, message, branch) for changes, message in commits]
+        return [oid for oid in made if oid]
+
+    def teammate_setup(self, file_path=None, original=None, change=None, commit_msg="Teammate:", checkpoint=None):
+
+        done_flag = self.remote_path / "teammate_pushed"
+        if done_flag.exists() or (self.teammate_path / ".teammate_pushed").exists():
             self.teammate_pushed = True
             return
-       
-        if not self.teammate_path.exists():
-           run_git_command(None, ["clone", self.git_path(self.remote_path), self.git_path(self.teammate_path)])
 
-        
-        branches = run_git_command(self.teammate_path, ["branch"])[1]
-        if "teammate/fix-alignment" not in branches:
-            run_git_command(self.teammate_path, ["checkout", "-b", "teammate/fix-alignment"])
-        else:
-            run_git_command(self.teammate_path, ["checkout", "teammate/fix-alignment"])  
+        if checkpoint and self.template and self.template.apply_checkpoint(checkpoint, self.remote_path):
+            done_flag.touch()
+            self.teammate_pushed = True
+            return
 
-        
         if file_path and original and change:
-            full_path = os.path.join(self.teammate_path, file_path)
-            if not os.path.exists(full_path):
+            tip = read_ref(self.remote_path, f"refs/heads/{self.remote_branch}")
+            if read_file_at(self.remote_path, tip, file_path) is None:
                 display.print(f"[red]❌ Teammate file missing: {file_path}[/]")
                 return
-            
-            with open(full_path, "r") as f:
-                content = f.read()
-            
-            new_content = content.replace(original, change)
-            if new_content != content:
-                with open(full_path, "w") as f:
-                   f.write(new_content)
-                run_git_command(self.teammate_path, ["add", file_path])
-                run_git_command(self.teammate_path, ["commit", "-m", commit_msg])
-        
-        
-        merge_base = run_git_command(self.teammate_path, ["merge-base", self.remote_branch, "teammate/fix-alignment"])[1].strip()
-        latest_commit = run_git_command(self.teammate_path, ["rev-parse", "teammate/fix-alignment"])[1].strip()
-        
-        if merge_base != latest_commit:
-           run_git_command(self.teammate_path, ["checkout", self.remote_branch])
-           run_git_command(self.teammate_path, ["merge", "teammate/fix-alignment"])
-        
-        run_git_command(self.teammate_path, ["push", "origin", self.remote_branch])
+
+            self.teammate_commit({file_path: lambda content: content.replace(original, change)}, commit_msg)
+
         done_flag.touch()
         self.teammate_pushed = True
 
@@ -81,14 +103,16 @@ class RemoteEngine:
     def git_path(p:Path):
         return str(p.resolve().as_posix())
     
+    def release(self):
+        """Close the cat-file coprocesses and pack handles open on this bug's repos."""
+        for path in (self.user_repo, self.remote_path):
+            close_cat_files(path)
+            close_object_stores(path)
+
     def cleanup(self):
         if self.teammate_path.exists():
             shutil.rmtree(self.teammate_path, ignore_errors=True)
 
-        fetch_marker = os.path.join(self.user_repo, ".git", "FETCH_HEAD_CUSTOM")
-        if os.path.exists(fetch_marker):
-           os.remove(fetch_marker)
-
         display.print(f"""
         [yellow][INFO] 🧹 Remote exits but teammate repos cleaned up.
         You can manually [red]delete remote repo[/] whenever you want.
@@ -98,95 +122,142 @@ class RemoteEngine:
 
 
 
-REMOTE_STATE_FILE = Path("./user_simulation/remote_teammate/remote_state.json")
-
 class RemoteManager:
-    _instance = None
-    _initialized = False
-    _instance_bug_id = None
+    """Registry of live RemoteEngines keyed by bug ("bug-<id>").
+
+    At most MAX_LIVE_REMOTES engines stay live; the least recently used one
+    is released and restored from its own state file when next needed.
+    """
+    _engines = OrderedDict()
 
     @classmethod
-    def init(cls, repo, bug, branch):
-        bug_id = f"bug-{bug['id']}"
-        cls._instance = RemoteEngine(repo, bug, branch)
-        cls._instance.setup()
-        cls._initialized = True
-        cls._instance_bug_id = bug_id
-
-        state = cls._load_state()
-        state[bug_id] = {
+    def init(cls, repo, bug, branch, template=None):
+        engine = RemoteEngine(repo, bug, branch, template)
+        engine.setup()
+        cls._track(engine)
+
+        cls._save_state(engine.bug_id, {
             "repo": str(repo),
             "bug": bug,
-            "branch": branch
-        }
-        cls._save_state(state)
+            "branch": branch,
+            "template": template.name if template else None
+        })
 
 
     @classmethod
     def get(cls, bug_id=None):
-        if cls._initialized and cls._instance:
-            return cls._instance
-
-        if REMOTE_STATE_FILE.exists():
-            try:
-                state = cls._load_state()
-
-                if not bug_id:
-                   bug_id = list(state.keys())[-1]
-
-                if bug_id not in state:
-                   raise ValueError(f"No saved state for {bug_id}")
-                
-                bug_state = state[bug_id]
-                bug = bug_state["bug"]
-                branch = bug_state["branch"]
-                repo = Path(bug_state["repo"])
-                
-                cls._instance = RemoteEngine(repo, bug, branch)
-                cls._instance.setup()
-                cls._initialized = True
-                cls._instance_bug_id = bug_id
-                
-                return cls._instance
-            
-            except Exception as e:
-                raise RuntimeError(f"[RemoteManager] Failed to restore state: {e}")
-
-        raise RuntimeError("[RemoteManager] Not initialized. You must call init(repo, bug, branch) first.")
+        if bug_id is None:
+            if cls._engines:
+                return next(reversed(cls._engines.values()))
+            bug_id = cls._latest_saved()
+
+        engine = cls._engines.get(bug_id)
+        if engine:
+            cls._engines.move_to_end(bug_id)
+            return engine
+
+        bug_state = cls._load_state(bug_id) if bug_id else None
+        if bug_state is None:
+            raise RuntimeError(f"[RemoteManager] No remote for {bug_id}. You must call init(repo, bug, branch) first.")
+
+        try:
+            branch = bug_state["branch"]
+            template = get_template(bug_state["template"], branch) if bug_state.get("template") else None
+            # restoring has no side effects; callers fetch when `is_stale()`
+            engine = RemoteEngine(Path(bug_state["repo"]), bug_state["bug"], branch, template)
+        except Exception as e:
+            raise RuntimeError(f"[RemoteManager] Failed to restore state: {e}")
+
+        cls._track(engine)
+        return engine
+
+
+    @classmethod
+    def for_repo(cls, repo):
+        """The engine whose learner repo is `repo`."""
+        repo = Path(repo).resolve()
+        for bug_id, engine in reversed(cls._engines.items()):
+            if Path(engine.user_repo).resolve() == repo:
+                return cls.get(bug_id)
+
+        for bug_id in cls._saved_ids():
+            bug_state = cls._load_state(bug_id)
+            if bug_state and Path(bug_state["repo"]).resolve() == repo:
+                return cls.get(bug_id)
+
+        raise RuntimeError(f"[RemoteManager] No remote for repo {repo}.")
 
     
     @classmethod
     def reset(cls, bug_id=None):
-        cls._instance = None
-        cls._initialized = False
-        cls._instance_bug_id = None
-
-        state = cls._load_state()
-        if not state:
-            return
+        bug_ids = [bug_id] if bug_id else list(cls._engines)
+        for key in bug_ids:
+            engine = cls._engines.pop(key, None)
+            if engine:
+                engine.release()
 
         if bug_id:
-            state.pop(bug_id, None)
+            remote_state_file(bug_id).unlink(missing_ok=True)
+            legacy = cls._load_legacy()
+            if legacy.pop(bug_id, None) is not None:
+                if legacy:
+                    cls._legacy_file().write_text(json.dumps(legacy, indent=2))
+                else:
+                    cls._legacy_file().unlink()
         else:
-            state.clear()
+            shutil.rmtree(remote_state_dir(), ignore_errors=True)
+            cls._legacy_file().unlink(missing_ok=True)
+
+
+    @classmethod
+    def _track(cls, engine):
+        cls._engines[engine.bug_id] = engine
+        cls._engines.move_to_end(engine.bug_id)
+        while len(cls._engines) > MAX_LIVE_REMOTES:
+            _, evicted = cls._engines.popitem(last=False)
+            evicted.release()
 
-        if state:
-            cls._save_state(state)
-        elif REMOTE_STATE_FILE.exists():
-            REMOTE_STATE_FILE.unlink()
-    
 
     @staticmethod
-    def _load_state():
-        if REMOTE_STATE_FILE.exists():
-            try:
-                return json.loads(REMOTE_STATE_FILE.read_text())
-            except json.JSONDecodeError:
-                return {}
-        return {}
+    def _legacy_file():
+        # single file every bug used to share; still read so old sessions resume
+        return bug_remote_base() / "remote_state.json"
+
+
+    @classmethod
+    def _load_legacy(cls):
+        try:
+            return json.loads(cls._legacy_file().read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+
+    @classmethod
+    def _saved_ids(cls):
+        paths = sorted(remote_state_dir().glob("*.json"), key=lambda p: p.stat().st_mtime)
+        return list(cls._load_legacy()) + [path.stem for path in paths]
+
+
+    @classmethod
+    def _latest_saved(cls):
+        saved = cls._saved_ids()
+        return saved[-1] if saved else None
+
+
+    @classmethod
+    def _load_state(cls, bug_id):
+        try:
+            return json.loads(remote_state_file(bug_id).read_text())
+        except FileNotFoundError:
+            return cls._load_legacy().get(bug_id)
+        except (OSError, json.JSONDecodeError):
+            return None
 
 
     @staticmethod
-    def _save_state(state):
-        REMOTE_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
-        REMOTE_STATE_FILE.write_text(json.dumps(state, indent=2))
+    def _save_state(bug_id, bug_state):
+        state_file = remote_state_file(bug_id)
+        state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = state_file.with_name(state_file.name + ".tmp")
+        tmp.write_text(json.dumps(bug_state, indent=2))
+        os.replace(tmp, state_file)
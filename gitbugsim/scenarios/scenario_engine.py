@@ -1,16 +1,18 @@
 from gitbugsim.git_simulation.git_utils import run_git_command, get_current_branch
 from gitbugsim.utils.display import display
 from gitbugsim.utils.common import currtime
-from gitbugsim.utils.file_ops import save_bugs
+from gitbugsim.utils.file_ops import bug_store
 from .scenario_hook import scenario_hook
 
 class ScenarioEngine:
 
-    def __init__(self, bug, repo, steps, bugs):
+    def __init__(self, bug, repo, steps, bugs, autosave=True):
         self.bug = bug
         self.repo = repo
         self.steps = steps
         self.bugs = bugs
+        self.autosave = autosave
+        self.dirty = False
         self.current_step = self.bug['scenario_status']['current_step']
         self.now = currtime()
       
@@ -52,23 +54,28 @@ class ScenarioEngine:
             display.print(f"❌ Check function {check_func_name} not found", style="red")
             return ''
        
-        if check_func(command, output, self.repo, parts):
-            self.current_step += 1
-            self.bug_history_update('in-progress') if self.current_step == 1 else None
-            self.bug['scenario_status']['current_step'] = self.current_step 
-            self.bug['scenario_status']['last_attempt'] = self.now
-
-            if self.current_step < len(self.steps):       
-                display.panel(f"✅ Objective [green]{step['name']}[/] completed!", 
-                f"""[yellow]🏆 Well done![/]\n👇 Now onto the next step:\n{self.show_current_step()}""",
-                "dim")  
-            else:
-                self.bug['scenario_status']['completed'] = True
-                self.bug_history_update('fixed')
-                return "completed"
-        
-        save_bugs(self.bugs)
-        return "in_progress"
+        if not check_func(command, output, self.repo, parts):
+            return "in_progress"
+
+        self.current_step += 1
+        self.bug_history_update('in-progress') if self.current_step == 1 else None
+        self.bug['scenario_status']['current_step'] = self.current_step 
+        self.bug['scenario_status']['last_attempt'] = self.now
+        self.dirty = True
+        progress = "in_progress"
+
+        if self.current_step < len(self.steps):       
+            display.panel(f"✅ Objective [green]{step['name']}[/] completed!", 
+            f"""[yellow]🏆 Well done![/]\n👇 Now onto the next step:\n{self.show_current_step()}""",
+            "dim")  
+        else:
+            self.bug['scenario_status']['completed'] = True
+            self.bug_history_update('fixed')
+            progress = "completed"
+
+        # one write per turn, covering the step and any history entries
+        self.save()
+        return progress
 
 
     def get_progress(self):
@@ -87,5 +94,14 @@ class ScenarioEngine:
         self.bug['updated_at'] = self.now
         self.bug['status'] = status
         self.bug['history'].append(history_entry)
-        save_bugs(self.bugs)
+        self.dirty = True
+
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        # graders replay on a copy of the bug and must not touch the store
+        if self.autosave:
+            bug_store().update(self.bug)
     
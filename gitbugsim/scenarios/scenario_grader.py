@@ -0,0 +1,132 @@
+import json, multiprocessing, os, sys, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from gitbugsim.utils.config import SCENARIO_FILE, template_cache_dir
+from gitbugsim.utils.display import display
+from gitbugsim.utils.file_ops import load_file
+from gitbugsim.git_simulation.git_utils import setup_git_repo_for_bug
+from gitbugsim.git_simulation.git_simulator import run_step, find_bug, fresh_bug, scratch_simulation
+from gitbugsim.git_simulation.transcript import parse_steps
+from .scenario_simulator import check_scenario_mode
+
+
+def read_transcript(path):
+    """Steps of a recorded session: a plain command list (one per line, `#`
+    comments), the JSONL records written by `simulate --script` / `--record`
+    (with the working-tree edits made before each command), or a script
+    with write/delete directives."""
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_steps(f.read().splitlines())
+
+
+def grade_transcript(path, bug, scenario_map, templates=None):
+    """Replay one transcript in a throwaway simulation root and score it."""
+    try:
+        commands, error = read_transcript(path), None
+    except ValueError as e:
+        commands, error = [], f"ValueError: {e}"
+    bug = fresh_bug(bug)
+    result = {
+        "transcript": str(path),
+        "bug": bug["id"],
+        "commands": len(commands),
+        "objectives_total": 0,
+        "objectives": [],
+        "completed": False,
+        "progress": 0,
+        "error_hooks": {},
+        "statuses": {},
+        "error": error
+    }
+    hooks, statuses = Counter(), Counter()
+
+    display.quiet = True
+
+    try:
+        if error:
+            raise ValueError(error)
+        with scratch_simulation("gitbug-grade-", templates):
+            repo = setup_git_repo_for_bug(bug["id"], bug["title"])
+            engine = check_scenario_mode(scenario_map, bug, repo, [bug], autosave=False)
+            steps = engine.steps if engine else []
+            step = engine.current_step if engine else 0
+            result["objectives_total"] = len(steps)
+
+            started = time.perf_counter()
+            first_ts = next((command.ts for command in commands if command.ts), None)
+
+            for index, command in enumerate(commands, start=1):
+                ts = command.ts
+                record, engine = run_step(command, repo, engine)
+                statuses[record["status"]] += 1
+                if record["error_hook"]:
+                    hooks[record["error_hook"]] += 1
+
+                scenario = record["scenario"]
+                if scenario:
+                    reached = len(steps) if scenario["completed"] else scenario["step"]
+                    while step < reached:
+                        result["objectives"].append({
+                            "name": steps[step]["name"],
+                            "command": index,
+                            "elapsed": round(ts - first_ts, 3) if ts and first_ts else None,
+                            "replay_seconds": round(time.perf_counter() - started, 3)
+                        })
+                        step += 1
+
+                if record["status"] == "exit":
+                    break
+
+            result["completed"] = bool(steps) and step == len(steps)
+            result["progress"] = int(step / len(steps) * 100) if steps else 0
+
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        display.quiet = False
+
+    result["error_hooks"] = dict(hooks)
+    result["statuses"] = dict(statuses)
+    return result
+
+
+def grade_transcripts(paths, bug, scenario_map, workers=None):
+    """Yield one result per transcript, in input order, grading them in a process pool."""
+    # every sandbox builds its scenario from the same template cache
+    templates = str(template_cache_dir().resolve())
+    if workers == 1:
+        for path in paths:
+            yield grade_transcript(path, bug, scenario_map, templates)
+        return
+
+    count = len(paths)
+    # spawn on every platform: workers start clean instead of inheriting the
+    # parent's open stores and git processes, and behave the same on macOS/Windows
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        yield from pool.map(grade_transcript, paths, [bug] * count, [scenario_map] * count, [templates] * count)
+
+
+def grade_cli(transcripts, bug, workers=None, output=None):
+    scenarios = load_file(SCENARIO_FILE)
+    scenario_map = {scenario['id']: scenario for scenario in scenarios} if scenarios else None
+    bug = find_bug(bug)
+
+    missing = [path for path in transcripts if not os.path.isfile(path)]
+    if missing:
+        display.print(f"❌ Transcript not found: [red]{', '.join(missing)}[/]")
+        exit(1)
+
+    out = open(output, "w", encoding="utf-8") if output else sys.stdout
+    graded = completed = 0
+    try:
+        for result in grade_transcripts(transcripts, bug, scenario_map, workers):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            graded += 1
+            completed += result["completed"]
+    finally:
+        if output:
+            out.close()
+
+    if output:
+        display.print(f"✅ Graded [cyan]{graded}[/] transcripts, [green]{completed}[/] completed the scenario → [yellow]{output}[/]")
@@ -1,7 +1,7 @@
 from .scenario_engine import ScenarioEngine
 from gitbugsim.utils.display import display
 
-def check_scenario_mode(scenario_map, bug, repo, bugs):
+def check_scenario_mode(scenario_map, bug, repo, bugs, autosave=True):
    
     scenario_engine = None
     scenario_id = bug.get('scenario_id')
@@ -12,7 +12,7 @@ def check_scenario_mode(scenario_map, bug, repo, bugs):
         icon = scenario_map[bug['scenario_id']]['icon']
         steps = scenario_map[bug['scenario_id']]['objective']
 
-        scenario_engine = ScenarioEngine(bug, repo, steps, bugs)
+        scenario_engine = ScenarioEngine(bug, repo, steps, bugs, autosave)
         scenario_engine.start(scenario_name, icon, scenario_title)
 
     else:
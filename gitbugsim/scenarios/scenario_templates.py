@@ -0,0 +1,205 @@
+import hashlib, json, os, shutil, subprocess, tempfile
+from pathlib import Path
+from gitbugsim.utils.config import template_cache_dir, TEAMMATE_NAME, TEAMMATE_EMAIL
+from gitbugsim.git_simulation.git_utils import git_build_signature
+from gitbugsim.git_simulation.git_refs import find_git_dir, read_raw_ref
+from gitbugsim.git_simulation.object_writer import commit_changes, ident
+
+# bump when a builder changes what it produces
+TEMPLATE_VERSION = 2
+
+template_builders = {}
+_templates = {}
+
+
+def scenario_template(name):
+    """Decorator to register the function that builds a scenario's template."""
+    def decorator(func):
+        template_builders[name] = func
+        return func
+    return decorator
+
+
+def link_or_copy(src, dst):
+    # objects are immutable, so sessions can share them with the template
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def link_objects(src_objects, dst_objects):
+    for dirpath, _, filenames in os.walk(src_objects):
+        target_dir = Path(dst_objects) / Path(dirpath).relative_to(src_objects)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for filename in filenames:
+            target = target_dir / filename
+            if not target.exists():
+                link_or_copy(Path(dirpath) / filename, target)
+
+
+def copy_git_dir(src, dst):
+    shutil.copytree(src, dst, ignore=shutil.ignore_patterns("objects", "hooks"), dirs_exist_ok=True)
+    link_objects(Path(src) / "objects", Path(dst) / "objects")
+
+
+def write_ref(git_dir, refname, oid):
+    path = Path(git_dir) / refname
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".lock")
+    tmp.write_text(oid + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_ref(git_dir, refname):
+    raw = read_raw_ref(Path(git_dir), refname)
+    return raw[1] if raw and raw[0] == "oid" else None
+
+
+class TemplateBuilder:
+    """Runs a scenario's setup once with the git CLI and records the result:
+    the learner's `.git`, the bare remote, and any named remote checkpoints."""
+
+    def __init__(self, path, branch):
+        self.path = Path(path)
+        self.branch = branch
+        self.local = self.path / "local"
+        self.remote = self.path / "remote.git"
+        self.manifest = {"version": TEMPLATE_VERSION, "branch": branch, "checkpoints": {}}
+
+        self.git(self.path, "init", "-q", "-b", branch, str(self.local))
+        self.git(self.path, "init", "-q", "--bare", "-b", branch, str(self.remote))
+
+    def git(self, cwd, *args):
+        result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+
+    def write(self, rel_path, content, root=None):
+        path = Path(root or self.local) / rel_path
+        path.write_text(content)
+
+    def commit(self, paths, message):
+        self.git(self.local, "add", *paths)
+        self.git(self.local, "commit", "-q", "-m", message)
+        self.git(self.local, "push", "-q", str(self.remote), f"{self.branch}:{self.branch}")
+
+    def mark_start(self):
+        local_git = self.local / ".git"
+        head = self.git(self.local, "rev-parse", "HEAD")
+        self.manifest["start"] = {
+            "local_refs": {f"refs/heads/{self.branch}": head, f"refs/remotes/origin/{self.branch}": head},
+            "remote_refs": {f"refs/heads/{self.branch}": read_ref(self.remote, f"refs/heads/{self.branch}")}
+        }
+        shutil.copytree(local_git, self.path / "local.git")
+        shutil.copytree(self.remote, self.path / "start-remote.git")
+
+    def teammate_commit(self, file_path, original, change, commit_msg):
+        author = ident(TEAMMATE_NAME, TEAMMATE_EMAIL)
+        changes = {file_path: lambda content: content.replace(original, change)}
+        commit_changes(self.remote, self.branch, changes, commit_msg, author)
+
+    def checkpoint(self, name):
+        refname = f"refs/heads/{self.branch}"
+        self.manifest["checkpoints"][name] = {"remote_refs": {refname: read_ref(self.remote, refname)}}
+        shutil.copytree(self.remote / "objects", self.path / "checkpoints" / name / "objects")
+
+    def finish(self):
+        for scratch in (self.local, self.remote):
+            shutil.rmtree(scratch, ignore_errors=True)
+        (self.path / "manifest.json").write_text(json.dumps(self.manifest, indent=2))
+
+
+class ScenarioTemplate:
+    """A built template; sessions are created from it by linking its objects
+    and writing refs, without running git."""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / "manifest.json").read_text())
+        self.branch = self.manifest["branch"]
+
+    def materialize(self, repo, remote_path, remote_url):
+        """Turn a freshly `git init`-ed repo into the scenario's start state.
+
+        Returns False, touching nothing, if the repo already has history or
+        the remote already exists; the caller then falls back to running the
+        setup commands.
+        """
+        git_dir = find_git_dir(repo)
+        remote_path = Path(remote_path)
+        if git_dir is None or any((git_dir / "refs" / "heads").iterdir()):
+            return False
+        if remote_path.exists() and any(remote_path.iterdir()):
+            return False
+
+        start = self.manifest["start"]
+        template_git = self.path / "local.git"
+
+        copy_git_dir(self.path / "start-remote.git", remote_path)
+        link_objects(template_git / "objects", git_dir / "objects")
+        shutil.copy2(template_git / "index", git_dir / "index")
+        for refname, oid in start["local_refs"].items():
+            write_ref(git_dir, refname, oid)
+
+        with open(git_dir / "config", "a", encoding="utf-8") as f:
+            f.write(f'[remote "origin"]\n\turl = {remote_url}\n\tfetch = +refs/heads/*:refs/remotes/origin/*\n')
+        return True
+
+    def apply_checkpoint(self, name, remote_path):
+        """Move the bare remote to a recorded checkpoint, if it is still at
+        the template's start state."""
+        checkpoint = self.manifest["checkpoints"].get(name)
+        if checkpoint is None:
+            return False
+
+        start = self.manifest["start"]["remote_refs"]
+        if any(read_ref(remote_path, refname) != oid for refname, oid in start.items()):
+            return False
+
+        link_objects(self.path / "checkpoints" / name / "objects", Path(remote_path) / "objects")
+        for refname, oid in checkpoint["remote_refs"].items():
+            write_ref(remote_path, refname, oid)
+        return True
+
+
+def template_key(name, branch):
+    signature = f"{TEMPLATE_VERSION}|{git_build_signature()}|{branch}"
+    return f"{name}-{branch.replace('/', '-')}-{hashlib.sha1(signature.encode()).hexdigest()[:12]}"
+
+
+def get_template(name, branch):
+    """The built template for scenario `name` on `branch`, building it on first use.
+
+    Returns None if the scenario has no template or the build fails.
+    """
+    builder = template_builders.get(name)
+    if builder is None:
+        return None
+
+    cache = template_cache_dir()
+    path = cache / template_key(name, branch)
+    if (path / "manifest.json").exists():
+        key = str(path)
+        if key not in _templates:
+            _templates[key] = ScenarioTemplate(name, path)
+        return _templates[key]
+
+    # build next to the final location and rename into place, so concurrent
+    # builders never see a half-written template
+    cache.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{name}-", dir=cache))
+    try:
+        build = TemplateBuilder(staging, branch)
+        builder(build)
+        build.finish()
+        os.rename(staging, path)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not (path / "manifest.json").exists():
+            return None
+    except subprocess.CalledProcessError:
+        shutil.rmtree(staging, ignore_errors=True)
+        return None
+
+    return get_template(name, branch)
@@ -0,0 +1,222 @@
+import hashlib, os, random, re, sqlite3
+from array import array
+from pathlib import Path
+from .config import DEDUPE_INDEX
+from .file_ops import after_write, bug_store
+
+# 20 bands of 3 rows: a pair at Jaccard similarity 0.5 shares at least one
+# band bucket 93% of the time, at 0.7 over 99.9%, at 0.1 about 2%
+PERMUTATIONS = 60
+BANDS = 20
+ROWS = PERMUTATIONS // BANDS
+THRESHOLD = 0.5
+
+# bump when signatures or banding change; older sidecars are rebuilt
+INDEX_VERSION = 2
+
+# buckets up to this size compare every pair of their bugs
+PAIRWISE_BUCKET = 64
+
+# each "permutation" XORs the shingles' 64-bit hashes with its own mask;
+# fixed seed, so signatures stay comparable across runs
+_rng = random.Random(20250601)
+MASKS = [_rng.getrandbits(64) for _ in range(PERMUTATIONS)]
+
+STOP_WORDS = {"a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "is", "it", "when", "with", "from", "by", "be"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (bug_id INTEGER PRIMARY KEY, signature BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, bucket INTEGER NOT NULL, bug_id INTEGER NOT NULL);
+"""
+
+# created after the initial bulk load, which is faster than keeping them up to date row by row
+INDEXES = """
+CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket);
+CREATE INDEX IF NOT EXISTS bands_bug ON bands (bug_id);
+"""
+
+_indexes = {}
+
+
+def shingles(title, description):
+    """Words and word pairs of the title and description."""
+    words = [w for w in re.findall(r"\w+", f"{title or ''} {description or ''}".lower()) if w not in STOP_WORDS]
+    found = set(words)
+    found.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return found
+
+
+def minhash(title, description):
+    values = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+              for s in shingles(title, description)]
+    if not values:
+        return None
+    return array("Q", (min(map(mask.__xor__, values)) for mask in MASKS))
+
+
+def band_buckets(signature):
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+        buckets.append((band, int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), "big", signed=True)))
+    return buckets
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two bugs' shingles."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / PERMUTATIONS
+
+
+def _sig(blob):
+    signature = array("Q")
+    signature.frombytes(blob)
+    return signature
+
+
+class DedupeIndex:
+    """MinHash signatures of every bug's title and description, banded for
+    LSH so likely duplicates are found by bucket lookups, not by comparing
+    against every bug. Kept in a sidecar and updated as the store writes."""
+
+    def __init__(self, path=DEDUPE_INDEX):
+        self.path = Path(path)
+        if not self.path.exists():
+            self._build()
+        self.conn = sqlite3.connect(self.path)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            self.rebuild()
+
+    def _insert(self, conn, bug_id, signature):
+        conn.execute("INSERT OR REPLACE INTO signatures (bug_id, signature) VALUES (?, ?)", (bug_id, signature.tobytes()))
+        conn.executemany("INSERT INTO bands (band, bucket, bug_id) VALUES (?, ?, ?)",
+                         [(band, bucket, bug_id) for band, bucket in band_buckets(signature)])
+
+    def _build(self):
+        # built aside and renamed in, like the search index
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.unlink(missing_ok=True)
+        conn = sqlite3.connect(tmp)
+        try:
+            with conn:
+                conn.executescript(SCHEMA)
+                for bug in bug_store().iter_bugs():
+                    signature = minhash(bug.get("title"), bug.get("description"))
+                    if signature:
+                        self._insert(conn, bug["id"], signature)
+                conn.executescript(INDEXES)
+                conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        finally:
+            conn.close()
+        os.replace(tmp, self.path)
+
+    def update(self, bug):
+        signature = minhash(bug.get("title"), bug.get("description"))
+        with self.conn:
+            row = self.conn.execute("SELECT signature FROM signatures WHERE bug_id = ?", (bug["id"],)).fetchone()
+            if row and signature and _sig(row[0]) == signature:
+                return  # status or history change; the text is the same
+            self.conn.execute("DELETE FROM signatures WHERE bug_id = ?", (bug["id"],))
+            self.conn.execute("DELETE FROM bands WHERE bug_id = ?", (bug["id"],))
+            if signature:
+                self._insert(self.conn, bug["id"], signature)
+
+    def rebuild(self):
+        self.conn.close()
+        self.path.unlink(missing_ok=True)
+        self._build()
+        self.conn = sqlite3.connect(self.path)
+
+    def _signatures(self, bug_ids):
+        found, bug_ids = {}, list(bug_ids)
+        for start in range(0, len(bug_ids), 500):
+            chunk = bug_ids[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT bug_id, signature FROM signatures WHERE bug_id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update((bug_id, _sig(blob)) for bug_id, blob in rows)
+        return found
+
+    def similar(self, title, description, limit=5, threshold=THRESHOLD, exclude=None):
+        """[(bug id, similarity)] of the likeliest duplicates, most similar first."""
+        signature = minhash(title, description)
+        if not signature:
+            return []
+
+        candidates = set()
+        for band, bucket in band_buckets(signature):
+            rows = self.conn.execute("SELECT bug_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket))
+            candidates.update(bug_id for (bug_id,) in rows)
+        candidates.discard(exclude)
+
+        scored = [(bug_id, similarity(signature, other)) for bug_id, other in self._signatures(candidates).items()]
+        scored = [(bug_id, score) for bug_id, score in scored if score >= threshold]
+        scored.sort(key=lambda hit: (-hit[1], hit[0]))
+        return scored[:limit]
+
+    def clusters(self, threshold=THRESHOLD):
+        """Groups of likely duplicates across the whole store, largest first.
+
+        Only bugs sharing a band bucket are compared: every pair in buckets
+        of up to PAIRWISE_BUCKET bugs, and each bug against the bucket's
+        group leaders in larger ones, so the work grows with the number of
+        bugs rather than the number of pairs.
+        """
+        parent = {}
+
+        def find(bug_id):
+            root = bug_id
+            while parent[root] != root:
+                root = parent[root]
+            while bug_id != root:
+                parent[bug_id], bug_id = root, parent[bug_id]
+            return root
+
+        def union(a, b):
+            parent[find(a)] = find(b)
+
+        buckets = self.conn.execute(
+            "SELECT group_concat(bug_id) FROM bands GROUP BY band, bucket HAVING count(*) > 1"
+        )
+        for (members,) in buckets:
+            signatures = self._signatures(int(bug_id) for bug_id in members.split(","))
+            members = sorted(signatures)
+            for bug_id in members:
+                parent.setdefault(bug_id, bug_id)
+
+            if len(members) <= PAIRWISE_BUCKET:
+                for i, a in enumerate(members):
+                    for b in members[i + 1:]:
+                        if similarity(signatures[a], signatures[b]) >= threshold:
+                            union(a, b)
+                continue
+
+            leaders = []
+            for bug_id in members:
+                similar = [leader for leader in leaders if similarity(signatures[leader], signatures[bug_id]) >= threshold]
+                for leader in similar:
+                    union(bug_id, leader)
+                if not similar:
+                    leaders.append(bug_id)
+
+        groups = {}
+        for bug_id in parent:
+            groups.setdefault(find(bug_id), []).append(bug_id)
+        return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda group: (-len(group), group[0]))
+
+
+def dedupe_index():
+    key = str(DEDUPE_INDEX)
+    if key not in _indexes:
+        _indexes[key] = DedupeIndex(DEDUPE_INDEX)
+    return _indexes[key]
+
+
+@after_write
+def index_signature(bug):
+    # nothing to keep fresh until the first duplicate check builds the index
+    if not DEDUPE_INDEX.exists():
+        return
+    try:
+        dedupe_index().update(bug)
+    except sqlite3.Error:
+        pass  # stale until `cli.py dedupe --rebuild`
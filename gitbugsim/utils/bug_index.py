@@ -0,0 +1,127 @@
+import json, os, struct
+
+HEADER = struct.Struct("<4sIQQQ")   # magic, version, snapshot size, snapshot mtime_ns, count
+RECORD = struct.Struct("<qQQ")      # bug id, byte offset, byte length
+MAGIC = b"GBIX"
+VERSION = 1
+
+
+class StaleIndex(Exception):
+    """The snapshot changed after its index was loaded."""
+
+
+def scan_offsets(path):
+    """(id, offset, length) of every bug in a JSON array file, in file order."""
+    with open(path, "rb") as f:
+        # latin-1 maps each byte to one char, so string positions are byte offsets
+        text = f.read().decode("latin-1")
+
+    decoder = json.JSONDecoder()
+    entries, pos = [], text.index("[") + 1
+    while True:
+        while text[pos] in " \t\r\n,":
+            pos += 1
+        if text[pos] == "]":
+            return entries
+        bug, end = decoder.raw_decode(text, pos)
+        entries.append((bug["id"], pos, end - pos))
+        pos = end
+
+
+def write_index(path, index_path):
+    """Write the sorted id index for the snapshot at `path`."""
+    st = os.stat(path)
+    entries = sorted(scan_offsets(path))
+    # readers rebuild a missing index without the store lock, so each writer gets its own tmp file
+    tmp = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, st.st_size, st.st_mtime_ns, len(entries)))
+        for entry in entries:
+            f.write(RECORD.pack(*entry))
+    os.replace(tmp, index_path)
+
+
+class SnapshotIndex:
+    """Sorted (id, offset, length) records for one version of bugs.json.
+
+    A lookup is a binary search over the records plus one seek into the
+    snapshot; the rest of the file is never read.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        _, _, self.size, self.mtime_ns, self.count = HEADER.unpack_from(data)
+
+    @classmethod
+    def load(cls, path, index_path):
+        """The index for `path`, or None if it is missing or out of date."""
+        try:
+            data = index_path.read_bytes()
+            st = os.stat(path)
+        except OSError:
+            return None
+        if len(data) < HEADER.size:
+            return None
+
+        magic, version, size, mtime_ns, count = HEADER.unpack_from(data)
+        if (magic, version, size, mtime_ns) != (MAGIC, VERSION, st.st_size, st.st_mtime_ns):
+            return None
+        if len(data) != HEADER.size + count * RECORD.size:
+            return None
+        return cls(data)
+
+    def _record(self, i):
+        return RECORD.unpack_from(self._data, HEADER.size + i * RECORD.size)
+
+    def find(self, bug_id):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe, offset, length = self._record(mid)
+            if probe < bug_id:
+                lo = mid + 1
+            elif probe > bug_id:
+                hi = mid
+            else:
+                return offset, length
+        return None
+
+    def _after(self, bug_id):
+        # position of the first record with an id above `bug_id`
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] <= bug_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def iter_bugs(self, path, after_id=None):
+        """(id, bug) pairs from the snapshot in id order, one record read at a time."""
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if (st.st_size, st.st_mtime_ns) != (self.size, self.mtime_ns):
+                raise StaleIndex(path)
+
+            start = 0 if after_id is None else self._after(after_id)
+            for i in range(start, self.count):
+                bug_id, offset, length = self._record(i)
+                f.seek(offset)
+                yield bug_id, json.loads(f.read(length))
+
+    def max_id(self):
+        return self._record(self.count - 1)[0] if self.count else 0
+
+    def read(self, path, bug_id):
+        found = self.find(bug_id)
+        if found is None:
+            return None
+
+        offset, length = found
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if (st.st_size, st.st_mtime_ns) != (self.size, self.mtime_ns):
+                raise StaleIndex(path)
+            f.seek(offset)
+            return json.loads(f.read(length))
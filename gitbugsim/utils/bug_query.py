@@ -0,0 +1,229 @@
+import re
+from collections import namedtuple
+
+Clause = namedtuple("Clause", "field column kind op values")
+
+# query name -> (bug key / SQL column, kind)
+FIELDS = {
+    "id": ("id", "int"),
+    "status": ("status", "text"),
+    "priority": ("priority", "text"),
+    "assignee": ("assigned_to", "text"),
+    "assigned_to": ("assigned_to", "text"),
+    "reporter": ("reported_by", "text"),
+    "reported_by": ("reported_by", "text"),
+    "scenario": ("scenario_id", "int"),
+    "scenario_id": ("scenario_id", "int"),
+    "tag": ("tags", "tag"),
+    "tags": ("tags", "tag"),
+    "created": ("created_at", "date"),
+    "created_at": ("created_at", "date"),
+    "updated": ("updated_at", "date"),
+    "updated_at": ("updated_at", "date"),
+    "title": ("title", "text"),
+    "description": ("description", "text"),
+}
+
+OPS = {
+    "int": {"=", "!=", ">", ">=", "<", "<=", "in"},
+    "text": {"=", "!=", "~", "in"},
+    "tag": {"=", "!=", "in"},
+    "date": {"=", "!=", ">", ">=", "<", "<="},
+}
+
+# `--sort priority` lists the most urgent first
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+# ISO timestamps only use digits, "-", "T" and ":", all of which sort below "~",
+# so `x[:len(v)] > v` is `x > v + "~"`, a plain comparison an index can serve
+DATE_END = "~"
+
+CLAUSE_IN = re.compile(r"^(\w+)\s+in\s*\((.*)\)$", re.IGNORECASE | re.DOTALL)
+CLAUSE_OP = re.compile(r"^(\w+)\s*(>=|<=|!=|=|>|<|~|:)\s*(.+)$", re.DOTALL)
+
+
+def like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class QueryError(ValueError):
+    """A --where or --sort expression that can't be parsed."""
+
+
+def _split_and(where):
+    # split on `and` outside quotes and parentheses
+    parts, depth, quote, start, i = [], 0, None, 0, 0
+    while i < len(where):
+        ch = where[i]
+        if quote:
+            quote = None if ch == quote else quote
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and re.match(r"\s+and\s+", where[i:], re.IGNORECASE) and i > start:
+            parts.append(where[start:i])
+            i += len(re.match(r"\s+and\s+", where[i:], re.IGNORECASE).group())
+            start = i
+            continue
+        i += 1
+    parts.append(where[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _value(raw, kind, field):
+    raw = raw.strip().strip("'\"")
+    if raw.lower() in {"none", "null"}:
+        return None
+    if kind == "int":
+        try:
+            return int(raw)
+        except ValueError:
+            raise QueryError(f"{field} needs a number, got '{raw}'")
+    return raw.lower() if kind == "tag" else raw
+
+
+def parse_clause(text):
+    match = CLAUSE_IN.match(text)
+    if match:
+        name, op, raw_values = match.group(1), "in", match.group(2).split(",")
+    else:
+        match = CLAUSE_OP.match(text)
+        if not match:
+            raise QueryError(f"can't read '{text}' (eg: status:open, created>2025-06-01, tag in (ui,api))")
+        name, op, raw_values = match.group(1), match.group(2), [match.group(3)]
+
+    name = name.lower()
+    if name not in FIELDS:
+        raise QueryError(f"unknown field '{name}' (fields: {', '.join(sorted(FIELDS))})")
+    column, kind = FIELDS[name]
+    op = "=" if op == ":" else op
+    if op not in OPS[kind]:
+        raise QueryError(f"'{op}' doesn't apply to {name}")
+
+    values = tuple(_value(raw, kind, name) for raw in raw_values if raw.strip())
+    if not values:
+        raise QueryError(f"'{text}' has no value")
+    return Clause(name, column, kind, op, values)
+
+
+def parse_sort(sort):
+    keys = []
+    for part in (sort or "").split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        descending = part.startswith("-")
+        name = part.lstrip("-")
+        if name not in FIELDS or FIELDS[name][1] == "tag":
+            raise QueryError(f"can't sort by '{name}'")
+        keys.append((FIELDS[name][0], descending))
+    return keys
+
+
+class BugQuery:
+    """A parsed `--where` / `--sort`, `and` of clauses.
+
+    Stores that can, run it through `to_sql()` so the indexes do the work;
+    the JSON store filters with `matches()` in one streaming pass.
+    """
+
+    def __init__(self, where=None, sort=None):
+        self.clauses = [parse_clause(part) for part in _split_and(where or "")]
+        self.sort = parse_sort(sort)
+
+    def _match_clause(self, clause, bug):
+        value = bug.get(clause.column)
+        op, values = clause.op, clause.values
+
+        if clause.kind == "tag":
+            tags = {tag.lower() for tag in value or []}
+            found = any(v in tags for v in values)
+            return not found if op == "!=" else found
+        if op == "in":
+            return value in values
+        if op == "~":
+            return value is not None and values[0] is not None and values[0].lower() in value.lower()
+
+        target = values[0]
+        if op == "!=":
+            return value != target if clause.kind != "date" else not self._match_clause(clause._replace(op="="), bug)
+        if value is None or target is None:
+            return op == "=" and value is target
+
+        if clause.kind == "date":
+            if op == "=":
+                return target <= value < target + DATE_END
+            if op in {">", "<="}:
+                target += DATE_END
+        return {"=": value == target, ">": value > target, ">=": value >= target,
+                "<": value < target, "<=": value <= target}[op]
+
+    def matches(self, bug):
+        return all(self._match_clause(clause, bug) for clause in self.clauses)
+
+    def _clause_sql(self, clause):
+        column, op, values = clause.column, clause.op, list(clause.values)
+
+        if clause.kind == "tag":
+            # values are lowercased on parse; lower(tag) matches them like matches() does
+            marks = ",".join("?" * len(values))
+            sql = f"id {'NOT IN' if op == '!=' else 'IN'} (SELECT bug_id FROM tags WHERE lower(tag) IN ({marks}))"
+            return sql, values
+        if op == "in":
+            present = [v for v in values if v is not None]
+            parts = [f"{column} IN ({','.join('?' * len(present))})"] if present else []
+            if None in values:
+                parts.append(f"{column} IS NULL")
+            return "(" + " OR ".join(parts) + ")", present
+        if op == "~":
+            if values[0] is None:
+                return "0", []
+            # `~` is a plain substring match, so the user's % and _ are literal
+            return f"{column} LIKE '%' || ? || '%' ESCAPE '\\'", [like_escape(values[0])]
+        if op == "!=":
+            if clause.kind == "date":
+                sql, params = self._clause_sql(clause._replace(op="="))
+                return f"NOT ({sql})", params
+            return f"{column} IS NOT ?", values
+
+        target = values[0]
+        if target is None:
+            return (f"{column} IS NULL", []) if op == "=" else ("0", [])
+        if clause.kind == "date":
+            if op == "=":
+                return f"({column} >= ? AND {column} < ?)", [target, target + DATE_END]
+            if op in {">", "<="}:
+                target += DATE_END
+        return f"{column} {op} ?", [target]
+
+    def to_sql(self):
+        """(WHERE clause, params, ORDER BY clause) for the SQLite bugs table."""
+        parts, params = [], []
+        for clause in self.clauses:
+            sql, clause_params = self._clause_sql(clause)
+            parts.append(sql)
+            params.extend(clause_params)
+        where = "WHERE " + " AND ".join(parts) if parts else ""
+
+        order = []
+        for column, descending in self.sort:
+            expr = column
+            if column == "priority":
+                expr = "CASE priority " + " ".join(f"WHEN '{p}' THEN {rank}" for p, rank in PRIORITY_RANK.items()) + " END"
+            order.append(f"{expr} IS NULL, {expr}{' DESC' if descending else ''}")
+        order.append("id")
+        return where, params, "ORDER BY " + ", ".join(order)
+
+    def sort_bugs(self, bugs):
+        # stable sorts, last key first; missing values always go last
+        for column, descending in reversed(self.sort):
+            def key(bug, column=column, descending=descending):
+                value = bug.get(column)
+                if column == "priority":
+                    value = PRIORITY_RANK.get(value)
+                return (value is not None, value) if descending else (value is None, value)
+            bugs.sort(key=key, reverse=descending)
+        return bugs
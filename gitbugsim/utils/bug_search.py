@@ -0,0 +1,100 @@
+import os, re, sqlite3
+from pathlib import Path
+from .config import SEARCH_INDEX
+from .file_ops import after_write, bug_store
+
+# bm25 column weights: title, description, history
+WEIGHTS = (10.0, 4.0, 1.0)
+
+SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS bug_text USING fts5(title, description, history, tokenize='porter unicode61')"
+
+_indexes = {}
+
+
+class SearchUnavailable(Exception):
+    """This Python's SQLite was built without FTS5."""
+
+
+def history_text(bug):
+    words = []
+    for entry in bug.get("history") or []:
+        words.extend(str(entry[key]) for key in ("action", "comment", "note") if entry.get(key))
+    return " ".join(words)
+
+
+def _row(bug):
+    return bug["id"], bug.get("title") or "", bug.get("description") or "", history_text(bug)
+
+
+class SearchIndex:
+    """Inverted index over bug titles, descriptions and history comments.
+
+    Kept in an SQLite FTS5 sidecar (porter-stemmed tokens, BM25 ranking)
+    and updated one bug at a time as the store writes, never rebuilt on
+    the way to a query.
+    """
+
+    def __init__(self, path=SEARCH_INDEX):
+        self.path = Path(path)
+        if not self.path.exists():
+            self._build()
+        self.conn = sqlite3.connect(self.path)
+
+    def _build(self):
+        # built aside and renamed in, so a half-built index is never searched
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.unlink(missing_ok=True)
+        conn = sqlite3.connect(tmp)
+        try:
+            try:
+                conn.execute(SCHEMA)
+            except sqlite3.OperationalError as e:
+                raise SearchUnavailable(str(e))
+            with conn:
+                conn.executemany("INSERT INTO bug_text (rowid, title, description, history) VALUES (?, ?, ?, ?)",
+                                 (_row(bug) for bug in bug_store().iter_bugs()))
+        finally:
+            conn.close()
+        os.replace(tmp, self.path)
+
+    def update(self, bug):
+        with self.conn:
+            self.conn.execute("DELETE FROM bug_text WHERE rowid = ?", (bug["id"],))
+            self.conn.execute("INSERT INTO bug_text (rowid, title, description, history) VALUES (?, ?, ?, ?)", _row(bug))
+
+    def rebuild(self):
+        self.conn.close()
+        self.path.unlink(missing_ok=True)
+        self._build()
+        self.conn = sqlite3.connect(self.path)
+
+    def search(self, text, limit=10):
+        """[(bug id, score)] best first; a bug matching more of the words ranks higher."""
+        terms = re.findall(r"\w+", text.lower())
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        rows = self.conn.execute(
+            "SELECT rowid, bm25(bug_text, ?, ?, ?) AS score FROM bug_text WHERE bug_text MATCH ? ORDER BY score LIMIT ?",
+            (*WEIGHTS, match, limit)
+        ).fetchall()
+        # bm25() is lower-is-better; flip it so scores read naturally
+        return [(bug_id, round(-score, 3)) for bug_id, score in rows]
+
+
+def search_index():
+    key = str(SEARCH_INDEX)
+    if key not in _indexes:
+        _indexes[key] = SearchIndex(SEARCH_INDEX)
+    return _indexes[key]
+
+
+@after_write
+def index_bug(bug):
+    # nothing to keep fresh until the first search builds the index
+    if not SEARCH_INDEX.exists():
+        return
+    try:
+        search_index().update(bug)
+    except sqlite3.Error:
+        pass  # the index lags behind; `cli.py search --rebuild` repairs it
@@ -1,5 +1,6 @@
 from datetime import datetime 
 from .display import display 
+from .file_ops import bug_store
 import re
 
 def currtime():
@@ -32,8 +33,8 @@ def prompt(emoji, field, emoji_width=2, space=1, field_width=35):
         return prompt(emoji, field, emoji_width, space, field_width)
 
 
-def bug_id_validation_prompt(bugs, open_only=False):
-    bug_map = {bug['id']: bug for bug in bugs}
+def bug_id_validation_prompt(bugs=None, open_only=False):
+    store = bug_store()
 
     while True:
         bug_id = prompt("🐞", "Bug ID")
@@ -44,7 +45,7 @@ def bug_id_validation_prompt(bugs, open_only=False):
             print("❌ Invalid input. Please enter a valid numeric Bug ID(1,2,....).")
             continue
 
-        bug = bug_map.get(bug_id_int)
+        bug = store.get(bug_id_int)
 
         if not bug:
             display.print(f"❌ Bug [red]#{bug_id_int}[/] not found.")
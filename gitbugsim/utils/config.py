@@ -1,6 +1,79 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 BUG_FILE = BASE_DIR / "data" / "bugs.json"
 USER_FILE = BASE_DIR / "data" / "users.json"
 SCENARIO_FILE = BASE_DIR / "data" / "scenarios.json"
+BUG_DB = BASE_DIR / "data" / "bugs.db"
+BUG_JOURNAL = BASE_DIR / "data" / "bugs.journal.jsonl"
+SEARCH_INDEX = BASE_DIR / "data" / "bugs.search.db"
+DEDUPE_INDEX = BASE_DIR / "data" / "bugs.minhash.db"
+
+# Fold the journal into bugs.json once it grows past this many bytes
+JOURNAL_COMPACT_BYTES = 1 << 20
+
+# "json" or "sqlite"; unset picks sqlite once `cli.py migrate` has created BUG_DB
+BUG_STORE = os.environ.get("GITBUG_STORE")
+
+# Everything a simulation writes (local repos, bare remotes, teammate clones,
+# caches) lives under one root, so graders can give each worker its own.
+_simulation = {
+    "root": Path(os.environ.get("GITBUG_SIM_ROOT", "./user_simulation")),
+    "templates": os.environ.get("GITBUG_TEMPLATE_DIR"),
+    "pool": os.environ.get("GITBUG_POOL_DIR")
+}
+
+
+def set_simulation_root(path):
+    _simulation["root"] = Path(path)
+
+
+def simulation_root():
+    return _simulation["root"]
+
+
+def set_template_cache_dir(path):
+    """Returns the previous setting (None: follow the simulation root)."""
+    previous, _simulation["templates"] = _simulation["templates"], path
+    return previous
+
+
+def template_cache_dir():
+    # shared across simulation roots unless set, so sandboxes reuse built templates
+    return Path(_simulation["templates"] or simulation_root() / "cache" / "templates")
+
+
+def sandbox_pool_dir():
+    # ready-made bug repos from `cli.py provision`
+    return Path(_simulation["pool"] or simulation_root() / "pool")
+
+
+def bug_repo_base():
+    return simulation_root() / "local_repos"
+
+
+def bug_remote_base():
+    return simulation_root() / "remote_teammate"
+
+
+def remote_state_dir():
+    return bug_remote_base() / "remote_state"
+
+
+def remote_state_file(bug_id):
+    return remote_state_dir() / f"{bug_id}.json"
+
+
+def git_cmds_cache():
+    return simulation_root() / "cache" / "git_cmds.json"
+
+# Commits shown above/below the changed ones in the before/after graph view
+GRAPH_WINDOW_DEPTH = 3
+
+# Identity used for commits the simulated teammate writes into a remote
+TEAMMATE_NAME = "Teammate"
+TEAMMATE_EMAIL = "teammate@gitbug.local"
+
+# RemoteEngines kept live at once; older ones release their git handles
+MAX_LIVE_REMOTES = 8
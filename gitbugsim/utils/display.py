@@ -4,6 +4,7 @@ from typing import Any
 class RichManager:
     def __init__(self):
         self.rich_available = False
+        self.quiet = False
         self._setup_rich()
 
     def _setup_rich(self):
@@ -19,6 +20,8 @@ class RichManager:
             self.rich_available = False
 
     def print(self, content: Any, style: str = None):
+        if self.quiet:
+            return
         if self.rich_available:
             if style:
                 self.rprint(self.Text(content, style=style))
@@ -28,6 +31,8 @@ class RichManager:
             print(content)
 
     def panel(self, title: str, content: str, border_style: str = "dim"):
+        if self.quiet:
+            return
         if self.rich_available:
             self.rprint(self.Panel(content, title=title, border_style=border_style))
         else:
@@ -1,5 +1,9 @@
-import json
-from .config import BUG_FILE, USER_FILE, SCENARIO_FILE
+import copy, heapq, itertools, json, os, sqlite3, time
+from contextlib import contextmanager
+from pathlib import Path
+from .bug_index import SnapshotIndex, StaleIndex, write_index
+from .bug_query import BugQuery
+from .config import BUG_FILE, BUG_DB, BUG_JOURNAL, BUG_STORE, JOURNAL_COMPACT_BYTES, USER_FILE, SCENARIO_FILE
 
 
 def load_file(FILE):
@@ -12,10 +16,516 @@ def load_file(FILE):
         exit(1)
 
 
-def save_bugs(bugs):
+# functions called with each bug after a store adds or updates it
+write_hooks = []
+
+
+def after_write(func):
+    """Decorator to register a function that keeps derived data (eg: the
+    search index) in step with single-bug writes."""
+    write_hooks.append(func)
+    return func
+
+
+def run_write_hooks(bug):
+    for hook in write_hooks:
+        hook(bug)
+
+
+def write_json_atomic(path, data):
+    # a crash mid-write leaves the old file, never a truncated one
+    tmp = Path(path).with_name(Path(path).name + ".tmp")
     try:
-        with open(BUG_FILE, "w") as f:
-            json.dump(bugs, f, indent=4)
-    except:
-        print(f"⚠️   File not found: {BUG_FILE}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp, path)
+    except OSError:
+        print(f"⚠️   File not found: {path}")
         exit(1)
+
+
+@contextmanager
+def file_lock(path, timeout=5.0, stale_after=60.0):
+    """Hold an exclusive lock by creating `path`; waits up to `timeout` seconds.
+
+    A lock older than `stale_after` seconds was left by a crashed process
+    and is broken.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.stat(path).st_mtime > stale_after:
+                    os.unlink(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{path} is locked")
+            time.sleep(0.01)
+
+    os.close(fd)
+    try:
+        yield
+    finally:
+        Path(path).unlink(missing_ok=True)
+
+
+def bug_event(old, new):
+    """The journal event that turns `old` into `new`, or None if they match.
+
+    Events are idempotent (fields are set, history is written from a given
+    index), so replaying one twice is harmless.
+    """
+    if old is None:
+        return {"event": "add", "bug": new}
+
+    fields = {key: value for key, value in new.items() if key != "history" and old.get(key) != value}
+    history, known = new.get("history", []), old.get("history", [])
+    at = len(known) if history[:len(known)] == known else 0
+    if not fields and len(history) == at:
+        return None
+    return {"event": "update", "id": new["id"], "set": fields, "history_at": at, "history": history[at:]}
+
+
+def apply_event(bugs, event):
+    # copies, so callers can edit what they get back without touching the journal
+    event = copy.deepcopy(event)
+    if event["event"] == "add":
+        bugs[event["bug"]["id"]] = event["bug"]
+        return
+
+    bug = bugs.get(event["id"])
+    if bug is None:
+        return
+    bug.update(event["set"])
+    bug["history"] = bug.get("history", [])[:event["history_at"]] + event["history"]
+
+
+def _file_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+class JsonBugStore:
+    """bugs.json as a snapshot plus an append-only journal of bug events.
+
+    A change appends one line to the journal; readers replay the journal
+    over the snapshot, picking up only new lines on later reads. Single
+    bugs are read through a sorted id index next to the snapshot, so a
+    lookup never parses the whole file. Past JOURNAL_COMPACT_BYTES the
+    journal is folded into a new snapshot.
+    """
+
+    def __init__(self, path=BUG_FILE, journal=BUG_JOURNAL):
+        self.path = Path(path)
+        self.journal = Path(journal)
+        self.compacting = self.journal.with_name(self.journal.name + ".compacting")
+        self.lock = self.path.with_name(self.path.name + ".lock")
+        self.journal_lock = self.journal.with_name(self.journal.name + ".lock")
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self.sequence = self.path.with_name(self.path.name + ".seq")
+        self._events = None
+        self._key = None
+        self._offset = 0
+        self._index = None
+
+    def _replay(self, path, offset=0):
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return offset
+
+        # a crash can leave a partial last line; it is skipped until completed
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                event = json.loads(line)
+                bug_id = event["bug"]["id"] if event["event"] == "add" else event["id"]
+            except (ValueError, KeyError):
+                continue
+            self._events.setdefault(bug_id, []).append(event)
+        return offset + end
+
+    def _sync(self):
+        # a new snapshot or a renamed journal means someone compacted
+        key = (_file_key(self.path), _inode(self.journal))
+        if self._events is not None and key == self._key and not self.compacting.exists():
+            self._offset = self._replay(self.journal, self._offset)
+            return
+
+        self._events, self._index = {}, None
+        self._replay(self.compacting)
+        self._offset = self._replay(self.journal)
+        self._key = key
+
+    def _snapshot_index(self):
+        if self._index is None:
+            self._index = SnapshotIndex.load(self.path, self.index_path)
+        if self._index is None:
+            try:
+                write_index(self.path, self.index_path)
+            except (OSError, ValueError, KeyError):
+                return None
+            self._index = SnapshotIndex.load(self.path, self.index_path)
+        return self._index
+
+    def _materialize(self):
+        bugs = {bug["id"]: bug for bug in load_file(self.path)}
+        for events in self._events.values():
+            for event in events:
+                apply_event(bugs, event)
+        return bugs
+
+    def all(self):
+        self._sync()
+        return list(self._materialize().values())
+
+    def get(self, bug_id):
+        self._sync()
+        index = self._snapshot_index()
+        try:
+            base = index.read(self.path, bug_id) if index else None
+        except StaleIndex:
+            self._key = None
+            return self.get(bug_id)
+        if index is None:
+            base = self._materialize().get(bug_id)
+
+        bugs = {bug_id: base} if base else {}
+        for event in self._events.get(bug_id, ()):
+            apply_event(bugs, event)
+        return bugs.get(bug_id)
+
+    def iter_bugs(self, after_id=None, limit=None, history=True):
+        """Bugs in id order after `after_id`, streamed from the snapshot so
+        memory stays flat however many bugs there are."""
+        self._sync()
+        index = self._snapshot_index()
+        if index is None:
+            bugs = sorted(self._materialize().values(), key=lambda bug: bug["id"])
+            snapshot = ((bug["id"], bug) for bug in bugs if after_id is None or bug["id"] > after_id)
+            journal_only = []
+        else:
+            snapshot = index.iter_bugs(self.path, after_id)
+            journal_only = sorted((bug_id, None) for bug_id in self._events
+                                  if index.find(bug_id) is None and (after_id is None or bug_id > after_id))
+
+        count, last_id = 0, after_id
+        try:
+            for bug_id, base in heapq.merge(snapshot, journal_only, key=lambda pair: pair[0]):
+                if limit is not None and count >= limit:
+                    return
+                bugs = {bug_id: base} if base else {}
+                for event in self._events.get(bug_id, ()):
+                    apply_event(bugs, event)
+                if bug_id in bugs:
+                    count += 1
+                    last_id = bug_id
+                    yield bugs[bug_id]
+        except StaleIndex:
+            # another process compacted into a new snapshot; carry on from there
+            self._key = None
+            yield from self.iter_bugs(last_id, None if limit is None else limit - count, history)
+
+    def query(self, query, after_id=None, limit=None, history=True):
+        """Bugs matching `query`: one streaming pass over the store, holding
+        only the matches in memory, and only when they need sorting."""
+        matches = (bug for bug in self.iter_bugs(after_id, history=history) if query.matches(bug))
+        if query.sort:
+            matches = iter(query.sort_bugs(list(matches)))
+        return itertools.islice(matches, limit)
+
+    def count(self):
+        self._sync()
+        index = self._snapshot_index()
+        if index is None:
+            return len(self._materialize())
+        added = sum(1 for bug_id, events in self._events.items()
+                    if index.find(bug_id) is None and any(event["event"] == "add" for event in events))
+        return index.count + added
+
+    def allocate_id(self):
+        """Reserve the next bug id. The last id handed out is persisted under
+        a lock, so concurrent reporters never get the same one."""
+        with file_lock(self.sequence.with_name(self.sequence.name + ".lock")):
+            try:
+                last = int(self.sequence.read_text())
+            except (OSError, ValueError):
+                last = 0
+
+            self._sync()
+            index = self._snapshot_index()
+            stored = index.max_id() if index else max(self._materialize(), default=0)
+            bug_id = max(last, stored, *self._events) + 1
+
+            tmp = self.sequence.with_name(self.sequence.name + ".tmp")
+            tmp.write_text(str(bug_id))
+            os.replace(tmp, self.sequence)
+        return bug_id
+
+    def _append(self, event):
+        line = (json.dumps(event) + "\n").encode("utf-8")
+        # compact() renames the journal under the same lock, so a line can't
+        # land in a journal that has already been folded into the snapshot
+        with file_lock(self.journal_lock):
+            fd = os.open(self.journal, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line)
+                end = os.lseek(fd, 0, os.SEEK_CUR)
+            finally:
+                os.close(fd)
+
+        # nobody else appended in between: our replayed events are current
+        if end - len(line) == self._offset:
+            self._events.setdefault(event["bug"]["id"] if event["event"] == "add" else event["id"], []).append(json.loads(line))
+            self._offset = end
+        if end > JOURNAL_COMPACT_BYTES:
+            self.compact()
+
+    def add(self, bug):
+        self._sync()
+        self._append(bug_event(None, bug))
+        run_write_hooks(bug)
+
+    def update(self, bug):
+        event = bug_event(self.get(bug["id"]), bug)
+        if event:
+            self._append(event)
+            run_write_hooks(bug)
+
+    def save_all(self, bugs):
+        for bug in bugs:
+            self.update(bug)
+
+    def compact(self):
+        """Fold the journal into a new bugs.json snapshot and its index.
+
+        The journal is renamed aside first so writers keep appending to a
+        fresh one; readers replay the renamed file until the snapshot lands.
+        """
+        try:
+            with file_lock(self.lock, timeout=0):
+                with file_lock(self.journal_lock):
+                    if not self.compacting.exists() and self.journal.exists():
+                        os.replace(self.journal, self.compacting)
+                self._events = {}
+                self._replay(self.compacting)
+                write_json_atomic(self.path, list(self._materialize().values()))
+                write_index(self.path, self.index_path)
+                self.compacting.unlink(missing_ok=True)
+        except TimeoutError:
+            return False  # another process is compacting
+        finally:
+            self._events = None
+        return True
+
+
+PAGE_ROWS = 500
+
+BUG_COLUMNS = ("id", "title", "description", "scenario_id", "status", "priority",
+               "assigned_to", "reported_by", "created_at", "updated_at")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bugs (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    scenario_id INTEGER,
+    status TEXT NOT NULL,
+    priority TEXT,
+    assigned_to TEXT,
+    reported_by TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    scenario_status TEXT
+);
+CREATE TABLE IF NOT EXISTS history (
+    bug_id INTEGER NOT NULL REFERENCES bugs(id),
+    seq INTEGER NOT NULL,
+    action TEXT,
+    by_user TEXT,
+    timestamp TEXT,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (bug_id, seq)
+);
+CREATE TABLE IF NOT EXISTS tags (
+    bug_id INTEGER NOT NULL REFERENCES bugs(id),
+    tag TEXT NOT NULL,
+    PRIMARY KEY (bug_id, tag)
+);
+CREATE TABLE IF NOT EXISTS sequence (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bugs_status ON bugs(status);
+CREATE INDEX IF NOT EXISTS bugs_assigned_to ON bugs(assigned_to);
+CREATE INDEX IF NOT EXISTS bugs_priority ON bugs(priority);
+CREATE INDEX IF NOT EXISTS bugs_scenario_id ON bugs(scenario_id);
+CREATE INDEX IF NOT EXISTS bugs_created_at ON bugs(created_at);
+CREATE INDEX IF NOT EXISTS bugs_updated_at ON bugs(updated_at);
+CREATE INDEX IF NOT EXISTS tags_tag_lower ON tags(lower(tag));
+"""
+
+
+class SqliteBugStore:
+    """Bugs, their history and tags in SQLite; every change is one
+    transaction touching only the rows of the bug that changed."""
+
+    def __init__(self, path=BUG_DB):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def _bugs(self, where="", params=(), limit=None, history=True):
+        sql = f"SELECT * FROM bugs {where} ORDER BY id" + (" LIMIT ?" if limit else "")
+        rows = self.conn.execute(sql, (*params, limit) if limit else params).fetchall()
+        ids = [row["id"] for row in rows]
+        if not ids:
+            return []
+
+        marks = ",".join("?" * len(ids))
+        tags, entries = {}, {}
+        for bug_id, tag in self.conn.execute(f"SELECT bug_id, tag FROM tags WHERE bug_id IN ({marks}) ORDER BY rowid", ids):
+            tags.setdefault(bug_id, []).append(tag)
+        if history:
+            for bug_id, entry in self.conn.execute(f"SELECT bug_id, entry FROM history WHERE bug_id IN ({marks}) ORDER BY bug_id, seq", ids):
+                entries.setdefault(bug_id, []).append(json.loads(entry))
+
+        bugs = []
+        for row in rows:
+            bug = {column: row[column] for column in BUG_COLUMNS}
+            bug["tags"] = tags.get(row["id"], [])
+            if history:
+                bug["history"] = entries.get(row["id"], [])
+            if row["scenario_status"] is not None:
+                bug["scenario_status"] = json.loads(row["scenario_status"])
+            bugs.append(bug)
+        return bugs
+
+    def all(self):
+        return list(self.iter_bugs())
+
+    def iter_bugs(self, after_id=None, limit=None, history=True):
+        return self.query(BugQuery(), after_id, limit, history)
+
+    def query(self, query, after_id=None, limit=None, history=True):
+        """Bugs matching `query` in its sort order (id order by default).
+
+        The filter and sort run in SQL on the indexed columns; matching ids
+        are read lazily and their bugs loaded PAGE_ROWS at a time. With
+        `history=False` the history table isn't read and bugs come back
+        without a "history" key.
+        """
+        where, params, order = query.to_sql()
+        if after_id is not None:
+            where = f"{where} AND id > ?" if where else "WHERE id > ?"
+            params = [*params, after_id]
+        sql = f"SELECT id FROM bugs {where} {order}" + (" LIMIT ?" if limit else "")
+        cursor = self.conn.execute(sql, [*params, limit] if limit else params)
+
+        while True:
+            ids = [row[0] for row in cursor.fetchmany(PAGE_ROWS)]
+            if not ids:
+                return
+            found = {bug["id"]: bug for bug in self._bugs(f"WHERE id IN ({','.join('?' * len(ids))})", ids, history=history)}
+            yield from (found[bug_id] for bug_id in ids if bug_id in found)
+
+    def get(self, bug_id):
+        bugs = self._bugs("WHERE id = ?", (bug_id,))
+        return bugs[0] if bugs else None
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM bugs").fetchone()[0]
+
+    def allocate_id(self):
+        """Reserve the next bug id; the bump and the read share one write
+        transaction, so concurrent reporters never get the same id."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO sequence (name, value) VALUES ('bugs', (SELECT COALESCE(MAX(id), 0) FROM bugs) + 1) "
+                "ON CONFLICT(name) DO UPDATE SET value = MAX(value, (SELECT COALESCE(MAX(id), 0) FROM bugs)) + 1"
+            )
+            return self.conn.execute("SELECT value FROM sequence WHERE name = 'bugs'").fetchone()[0]
+
+    def _write(self, bug):
+        values = [bug.get(column) for column in BUG_COLUMNS]
+        scenario_status = json.dumps(bug["scenario_status"]) if "scenario_status" in bug else None
+        updates = ", ".join(f"{column} = excluded.{column}" for column in BUG_COLUMNS[1:] + ("scenario_status",))
+        self.conn.execute(
+            f"INSERT INTO bugs ({', '.join(BUG_COLUMNS)}, scenario_status) VALUES ({', '.join('?' * (len(BUG_COLUMNS) + 1))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}",
+            values + [scenario_status]
+        )
+
+        self.conn.execute("DELETE FROM tags WHERE bug_id = ?", (bug["id"],))
+        self.conn.executemany("INSERT OR IGNORE INTO tags (bug_id, tag) VALUES (?, ?)",
+                              [(bug["id"], tag) for tag in bug.get("tags") or []])
+
+        # history only ever grows, so only the new entries are inserted
+        known = self.conn.execute("SELECT COUNT(*) FROM history WHERE bug_id = ?", (bug["id"],)).fetchone()[0]
+        self.conn.executemany(
+            "INSERT INTO history (bug_id, seq, action, by_user, timestamp, entry) VALUES (?, ?, ?, ?, ?, ?)",
+            [(bug["id"], seq, entry.get("action"), entry.get("by"), entry.get("timestamp"), json.dumps(entry))
+             for seq, entry in enumerate(bug.get("history") or []) if seq >= known]
+        )
+
+    def add(self, bug):
+        with self.conn:
+            self._write(bug)
+        run_write_hooks(bug)
+
+    def update(self, bug):
+        with self.conn:
+            self._write(bug)
+        run_write_hooks(bug)
+
+    def save_all(self, bugs):
+        with self.conn:
+            for bug in bugs:
+                self._write(bug)
+
+
+_stores = {}
+
+
+def bug_store():
+    """The configured bug store (see BUG_STORE), opened once per process."""
+    backend = BUG_STORE or ("sqlite" if BUG_DB.exists() else "json")
+    if backend not in _stores:
+        _stores[backend] = SqliteBugStore() if backend == "sqlite" else JsonBugStore()
+    return _stores[backend]
+
+
+def migrate_bugs(json_path=BUG_FILE, db_path=BUG_DB, journal=BUG_JOURNAL):
+    """Copy every bug from the JSON file into a new SQLite store.
+
+    The database is built next to `db_path` and renamed into place, so the
+    store switches over only once the copy is complete. Returns the count.
+    """
+    bugs = JsonBugStore(json_path, journal).all()
+    tmp = Path(db_path).with_name(Path(db_path).name + ".tmp")
+    tmp.unlink(missing_ok=True)
+
+    store = SqliteBugStore(tmp)
+    store.save_all(bugs)
+    store.conn.close()
+    os.replace(tmp, db_path)
+    _stores.clear()
+    return len(bugs)
@@ -0,0 +1,17 @@
+import subprocess
+
+
+def git(repo, *args):
+    result = subprocess.run(
+        ["git", "-c", "user.name=Tester", "-c", "user.email=tester@example.com",
+         "-c", "commit.gpgsign=false", "-c", "tag.gpgsign=false", *args],
+        cwd=repo, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+def commit(repo, name, content="x\n"):
+    (repo / name).write_text(content)
+    git(repo, "add", name)
+    git(repo, "commit", "-q", "-m", f"add {name}")
+    return git(repo, "rev-parse", "HEAD")
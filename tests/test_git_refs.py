@@ -0,0 +1,90 @@
+import pytest
+from gitbugsim.git_simulation.git_refs import read_head, resolve_ref, list_refs, find_git_dir
+from gitbugsim.git_simulation.git_utils import get_current_branch
+from git_helpers import git, commit
+
+
+def for_each_ref(repo):
+    output = git(repo, "for-each-ref", "--format=%(objectname) %(refname)")
+    return dict(reversed(line.split(" ", 1)) for line in output.splitlines())
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "-q", "-b", "main")
+    commit(path, "a.txt")
+    git(path, "branch", "feature/login")
+    commit(path, "b.txt")
+    git(path, "tag", "v1")
+    git(path, "tag", "-a", "v2", "-m", "release")
+    git(path, "update-ref", "refs/remotes/origin/main", "HEAD~1")
+    git(path, "symbolic-ref", "refs/remotes/origin/HEAD", "refs/remotes/origin/main")
+    return path
+
+
+def test_loose_refs_match_git(repo):
+    assert read_head(repo) == ("ref", "refs/heads/main")
+    assert resolve_ref(repo, "HEAD") == git(repo, "rev-parse", "HEAD")
+    assert list_refs(repo) == for_each_ref(repo)
+    assert get_current_branch(repo) == "main"
+
+
+def test_packed_refs_match_git(repo):
+    git(repo, "pack-refs", "--all")
+    assert not (repo / ".git" / "refs" / "heads" / "main").exists()
+
+    assert list_refs(repo) == for_each_ref(repo)
+    assert resolve_ref(repo, "refs/heads/feature/login") == git(repo, "rev-parse", "feature/login")
+    # an annotated tag resolves to the tag object, not its peeled commit
+    assert resolve_ref(repo, "refs/tags/v2") == git(repo, "rev-parse", "v2")
+
+
+def test_loose_ref_overrides_packed(repo):
+    git(repo, "pack-refs", "--all")
+    new_tip = commit(repo, "c.txt")
+
+    assert (repo / ".git" / "refs" / "heads" / "main").exists()
+    assert resolve_ref(repo, "HEAD") == new_tip
+    assert list_refs(repo) == for_each_ref(repo)
+
+
+def test_symbolic_ref(repo):
+    assert resolve_ref(repo, "refs/remotes/origin/HEAD") == git(repo, "rev-parse", "origin/main")
+    assert list_refs(repo, "refs/remotes/")["refs/remotes/origin/HEAD"] == git(repo, "rev-parse", "origin/HEAD")
+
+
+def test_detached_head(repo):
+    git(repo, "checkout", "-q", "--detach", "HEAD~1")
+
+    assert read_head(repo) == ("oid", git(repo, "rev-parse", "HEAD"))
+    assert resolve_ref(repo, "HEAD") == git(repo, "rev-parse", "HEAD")
+    assert get_current_branch(repo) == "detach-head"
+
+
+def test_unborn_branch(tmp_path):
+    git(tmp_path, "init", "-q", "-b", "trunk")
+
+    assert read_head(tmp_path) == ("ref", "refs/heads/trunk")
+    assert resolve_ref(tmp_path, "HEAD") is None
+    assert list_refs(tmp_path) == {}
+    assert get_current_branch(tmp_path) == "trunk"
+
+
+def test_linked_worktree_uses_commondir(repo, tmp_path):
+    worktree = tmp_path / "worktree"
+    git(repo, "worktree", "add", "-q", "-b", "wt-branch", str(worktree), "feature/login")
+    git(repo, "pack-refs", "--all")
+
+    git_dir = find_git_dir(worktree)
+    assert (git_dir / "commondir").exists()
+
+    assert read_head(worktree) == ("ref", "refs/heads/wt-branch")
+    assert resolve_ref(worktree, "HEAD") == git(worktree, "rev-parse", "HEAD")
+    assert get_current_branch(worktree) == "wt-branch"
+    # branches live in the common dir, so both checkouts see the same refs
+    assert list_refs(worktree) == for_each_ref(worktree) == list_refs(repo)
+
+    moved = commit(worktree, "wt.txt")
+    assert resolve_ref(repo, "refs/heads/wt-branch") == moved
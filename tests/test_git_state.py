@@ -0,0 +1,91 @@
+import subprocess
+import pytest
+from gitbugsim.git_simulation.git_state import GitStateSnapshot
+from git_helpers import git, commit
+
+FIELDS = ("head_oid", "branch", "upstream", "ahead", "behind", "staged", "unstaged", "unmerged", "untracked")
+
+
+def views(snapshot):
+    return {field: getattr(snapshot, field) for field in FIELDS}
+
+
+def assert_parity(repo):
+    native = GitStateSnapshot.capture_native(repo)
+    porcelain = GitStateSnapshot.capture_porcelain(repo)
+    assert porcelain.ok
+    assert views(native) == views(porcelain)
+    return native
+
+
+@pytest.fixture(autouse=True)
+def isolated_config(tmp_path, monkeypatch):
+    # the native path bails out on user config it doesn't model; keep both paths on repo config only
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "home" / ".config"))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "repo"
+    git(tmp_path, "init", "-q", "-b", "main", str(path))
+    commit(path, "a.txt", "alpha\n")
+    commit(path, "b.txt", "beta\n")
+    return path
+
+
+def test_staged_rename(repo):
+    git(repo, "mv", "a.txt", "c.txt")
+    (repo / "new.txt").write_text("untracked\n")
+
+    native = assert_parity(repo)
+    assert native.staged == ["a.txt", "c.txt"]
+    assert native.untracked == ["new.txt"]
+
+
+def test_rename_with_worktree_edit(repo):
+    git(repo, "mv", "b.txt", "d.txt")
+    (repo / "d.txt").write_text("beta\nmore\n")
+    (repo / "a.txt").write_text("changed\n")
+
+    native = assert_parity(repo)
+    assert ("M", "d.txt") in native.unstaged
+
+
+def test_merge_conflict(repo):
+    git(repo, "checkout", "-q", "-b", "feature")
+    commit(repo, "a.txt", "feature side\n")
+    git(repo, "checkout", "-q", "main")
+    commit(repo, "a.txt", "main side\n")
+    with pytest.raises(subprocess.CalledProcessError):
+        git(repo, "merge", "-q", "feature")
+
+    native = assert_parity(repo)
+    assert native.unmerged == ["a.txt"]
+
+
+def test_upstream_ahead_behind(repo, tmp_path):
+    remote, other = tmp_path / "remote.git", tmp_path / "other"
+    git(tmp_path, "init", "-q", "--bare", "-b", "main", str(remote))
+    git(repo, "remote", "add", "origin", str(remote))
+    git(repo, "push", "-q", "-u", "origin", "main")
+    git(tmp_path, "clone", "-q", str(remote), str(other))
+    commit(other, "teammate.txt")
+    git(other, "push", "-q", "origin", "main")
+    git(repo, "fetch", "-q", "origin")
+    commit(repo, "mine.txt")
+
+    native = assert_parity(repo)
+    assert (native.upstream, native.ahead, native.behind) == ("origin/main", 1, 1)
+
+
+def test_packed_repo(repo):
+    git(repo, "-c", "gc.writeCommitGraph=true", "gc", "-q")
+    assert not list((repo / ".git" / "objects").glob("??/*"))
+    commit(repo, "after-gc.txt")
+    (repo / "b.txt").write_text("edited\n")
+    git(repo, "add", "b.txt")
+
+    native = assert_parity(repo)
+    assert native.staged == ["b.txt"]
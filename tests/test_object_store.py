@@ -0,0 +1,62 @@
+import pytest
+from gitbugsim.git_simulation.object_store import ObjectStore
+from gitbugsim.git_simulation.git_state import GitStateSnapshot
+from git_helpers import git, commit
+
+
+def left_right(repo, left, right):
+    ahead, behind = git(repo, "rev-list", "--left-right", "--count", f"{left}...{right}").split()
+    return int(ahead), int(behind)
+
+
+@pytest.fixture
+def tracked(tmp_path):
+    """A clone whose main has been pushed, gc'd into a commit-graph, then
+    moved on locally and on the remote."""
+    remote, repo, other = tmp_path / "remote.git", tmp_path / "repo", tmp_path / "other"
+    git(tmp_path, "init", "-q", "--bare", "-b", "main", str(remote))
+    git(tmp_path, "init", "-q", "-b", "main", str(repo))
+    for i in range(4):
+        commit(repo, f"base{i}.txt")
+    git(repo, "remote", "add", "origin", str(remote))
+    git(repo, "push", "-q", "-u", "origin", "main")
+    commit(repo, "before-gc.txt")
+
+    git(repo, "-c", "gc.writeCommitGraph=true", "gc", "-q")
+    assert (repo / ".git" / "objects" / "info" / "commit-graph").exists()
+    commit(repo, "after-gc.txt")
+    return repo, remote, other
+
+
+def test_ahead_behind_after_gc_matches_git(tracked):
+    repo, _, _ = tracked
+    store = ObjectStore(repo / ".git" / "objects")
+    head, upstream = git(repo, "rev-parse", "HEAD"), git(repo, "rev-parse", "origin/main")
+
+    assert store.ahead_behind(head, upstream) == left_right(repo, "HEAD", "origin/main") == (2, 0)
+    snapshot = GitStateSnapshot.capture_native(repo)
+    assert (snapshot.ahead, snapshot.behind) == (2, 0)
+
+
+def test_ahead_behind_diverged_after_gc_matches_git(tracked):
+    repo, remote, other = tracked
+    git(other.parent, "clone", "-q", str(remote), str(other))
+    commit(other, "teammate.txt")
+    git(other, "push", "-q", "origin", "main")
+    git(repo, "fetch", "-q", "origin")
+
+    store = ObjectStore(repo / ".git" / "objects")
+    head, upstream = git(repo, "rev-parse", "HEAD"), git(repo, "rev-parse", "origin/main")
+    assert store.ahead_behind(head, upstream) == left_right(repo, "HEAD", "origin/main") == (2, 1)
+
+    snapshot = GitStateSnapshot.capture_native(repo)
+    porcelain = GitStateSnapshot.capture_porcelain(repo)
+    assert (snapshot.ahead, snapshot.behind) == (porcelain.ahead, porcelain.behind)
+
+
+def test_generation_walk_keeps_children_first(tracked):
+    repo, _, _ = tracked
+    store = ObjectStore(repo / ".git" / "objects")
+    walked = [c.oid for c in store.walk([git(repo, "rev-parse", "HEAD")], generation_order=True)]
+
+    assert walked == git(repo, "rev-list", "--topo-order", "HEAD").splitlines()
@@ -0,0 +1,57 @@
+import pytest
+from gitbugsim.git_simulation.transcript import parse_steps, apply_edits, WorktreeRecorder
+
+
+def test_directives_fold_into_next_command():
+    steps = parse_steps([
+        "# comment",
+        "status",
+        '{"write": "src/app.css", "content": "a {}\\n"}',
+        '{"delete": "old.txt"}',
+        "add -A",
+        '{"cmd": "commit -m x", "ts": 12.5, "edits": {"notes.md": "hi"}}',
+        '{"write": "tail.txt", "content": "end"}',
+    ])
+
+    assert [(s.line, s.cmd, s.ts, s.edits) for s in steps] == [
+        (2, "status", None, {}),
+        (5, "add -A", None, {"src/app.css": "a {}\n", "old.txt": None}),
+        (6, "commit -m x", 12.5, {"notes.md": "hi"}),
+        (7, "", None, {"tail.txt": "end"}),
+    ]
+
+
+@pytest.mark.parametrize("line", [
+    '{"write": ".git/config", "content": ""}',
+    '{"write": "../outside.txt", "content": ""}',
+    '{"delete": "/etc/passwd"}',
+    '{"content": "no path"}',
+    '{not json',
+])
+def test_rejects_bad_lines(line):
+    with pytest.raises(ValueError):
+        parse_steps(["status", line])
+
+
+def test_recorder_round_trips_through_apply_edits(tmp_path):
+    learner, replay = tmp_path / "learner", tmp_path / "replay"
+    for repo in (learner, replay):
+        (repo / ".git").mkdir(parents=True)
+        (repo / "keep.txt").write_text("same\n")
+        (repo / "gone.txt").write_text("bye\n")
+    recorder = WorktreeRecorder(learner)
+
+    (learner / "src").mkdir()
+    (learner / "src" / "new.css").write_text("a {}\r\n")
+    (learner / "gone.txt").unlink()
+    (learner / ".git" / "index").write_text("ignored")
+    edits = recorder.edits()
+    assert edits == {"src/new.css": "a {}\r\n", "gone.txt": None}
+
+    (learner / "keep.txt").write_text("written by git\n")
+    recorder.refresh()
+    assert recorder.edits() == {}
+
+    apply_edits(replay, edits)
+    assert (replay / "src" / "new.css").read_bytes() == b"a {}\r\n"
+    assert not (replay / "gone.txt").exists()